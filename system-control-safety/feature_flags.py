@@ -4,6 +4,7 @@ Production-ready feature flag system for Sarkar AI Assistant
 Supports: user-level, system-level, gradual rollouts, A/B testing, emergency kills
 """
 
+import copy
 import json
 import logging
 from typing import Dict, Any, Optional, List
@@ -11,6 +12,9 @@ from enum import Enum
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import hashlib
+import threading
+import time
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +35,7 @@ class FlagScope(Enum):
     ENVIRONMENT = "environment"  # dev/staging/prod
 
 
-@dataclass
+@dataclass(slots=True)
 class FeatureFlag:
     """Feature flag definition"""
     key: str
@@ -67,13 +71,48 @@ class FeatureFlagManager:
     Thread-safe, fast lookups, supports hot-reloading
     """
     
+    # Seconds a memoized is_enabled/get_variant answer stays valid
+    CACHE_TTL_SECONDS = 30.0
+    # Most evaluations kept; per-user keys would otherwise grow without bound
+    CACHE_MAX_ENTRIES = 1024
+    
     def __init__(self, config_path: str = "flags.json"):
         self.config_path = config_path
         self.flags: Dict[str, FeatureFlag] = {}
+        self._eval_cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0  # Bumped by invalidate()
         self._load_flags()
+    
+    def invalidate(self):
+        """Drop memoized flag evaluations (called whenever flags change)"""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._eval_cache.clear()
+    
+    def _cached(self, key: tuple, compute):
+        """Return a memoized evaluation, recomputing it once the TTL expires"""
+        now = time.monotonic()
+        with self._cache_lock:
+            hit = self._eval_cache.get(key)
+            if hit is not None and hit[0] > now:
+                self._eval_cache.move_to_end(key)
+                return hit[1]
+            generation = self._cache_generation
+        
+        # Computed outside the lock; a flag change meanwhile makes it stale
+        value = compute()
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._eval_cache[key] = (now + self.CACHE_TTL_SECONDS, value)
+                self._eval_cache.move_to_end(key)
+                if len(self._eval_cache) > self.CACHE_MAX_ENTRIES:
+                    self._eval_cache.popitem(last=False)  # Evict the least recently used
+        return value
         
     def _load_flags(self):
         """Load flags from persistent storage"""
+        self.invalidate()
         try:
             with open(self.config_path, 'r') as f:
                 data = json.load(f)
@@ -179,6 +218,13 @@ class FeatureFlagManager:
             user_id: Optional user ID for user-scoped flags
             default: Default value if flag doesn't exist
         """
+        return self._cached(
+            ("enabled", flag_key, user_id, default),
+            lambda: self._evaluate(flag_key, user_id, default)
+        )
+    
+    def _evaluate(self, flag_key: str, user_id: Optional[str], default: bool) -> bool:
+        """Uncached is_enabled evaluation"""
         if flag_key not in self.flags:
             logger.warning(f"Flag {flag_key} not found, using default: {default}")
             return default
@@ -213,6 +259,13 @@ class FeatureFlagManager:
         user_id: Optional[str] = None
     ) -> Optional[str]:
         """Get variant for multivariate flag (A/B/C testing)"""
+        return self._cached(
+            ("variant", flag_key, user_id),
+            lambda: self._assign_variant(flag_key, user_id)
+        )
+    
+    def _assign_variant(self, flag_key: str, user_id: Optional[str]) -> Optional[str]:
+        """Uncached get_variant evaluation"""
         if flag_key not in self.flags:
             return None
         
@@ -265,6 +318,7 @@ class FeatureFlagManager:
         
         flag.enabled = enabled
         flag.updated_at = datetime.utcnow().isoformat()
+        self.invalidate()
         self._save_flags()
         
         logger.info(f"Flag {flag_key} set to {enabled}")
@@ -277,17 +331,17 @@ class FeatureFlagManager:
         
         self.flags[flag_key].enabled = False
         self.flags[flag_key].updated_at = datetime.utcnow().isoformat()
+        self.invalidate()
         self._save_flags()
         
         logger.critical(f"EMERGENCY DISABLE: {flag_key}")
         return True
     
-    def get_all_flags(self) -> Dict[str, Dict[str, Any]]:
-        """Get all flags for admin dashboard"""
-        return {
-            key: asdict(flag) 
-            for key, flag in self.flags.items()
-        }
+    def get_all_flags(self) -> Dict[str, FeatureFlag]:
+        """Get copies of all flags for admin dashboard (use asdict() to serialize)"""
+        # Deep copies: edits to a returned flag (or its variants) must not
+        # bypass update_flag's invalidation and persistence
+        return {key: copy.deepcopy(flag) for key, flag in self.flags.items()}
     
     def reload(self):
         """Hot reload flags from storage"""
@@ -320,8 +374,8 @@ def get_variant(flag_key: str, user_id: Optional[str] = None) -> Optional[str]:
 
 # Example usage in Sarkar agents
 if __name__ == "__main__":
-    # Initialize
-    flags = FeatureFlagManager()
+    # Initialize (shared with the convenience functions)
+    flags = get_flag_manager()
     
     # Check if web search is enabled
     if is_enabled("agents.web_search.enabled"):
@@ -343,5 +397,5 @@ if __name__ == "__main__":
     # Print all flags
     print("\nAll feature flags:")
     for key, flag in flags.get_all_flags().items():
-        status = "🟢" if flag['enabled'] else "🔴"
-        print(f"{status} {key}: {flag['description']}")
\ No newline at end of file
+        status = "🟢" if flag.enabled else "🔴"
+        print(f"{status} {key}: {flag.description}")
\ No newline at end of file
@@ -9,19 +9,68 @@ import os
 import sys
 import subprocess
 import shutil
+import shlex
+import re
+import fnmatch
+import codecs
+import io
+import locale
+import random
+import threading
+from itertools import islice
 import logging
 import json
 import hashlib
+import time
+import functools
+import atexit
+import weakref
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
-from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Any, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from enum import Enum
 import platform
 
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _json_dumps(data: Any) -> str:
+    """Serialize to a compact JSON string (orjson when installed)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data).decode()
+    return json.dumps(data)
+
+
+def _json_loads(data) -> Any:
+    """Parse JSON from str or bytes (orjson when installed)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_load_file(path: str) -> Any:
+    """Read a JSON file"""
+    with open(path, 'rb') as f:
+        return _json_loads(f.read())
+
+
+def _json_dump_file(data: Any, path: str):
+    """Write data to a JSON file with 2-space indentation"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
 
 class PermissionLevel(Enum):
     """Permission levels for system operations"""
@@ -42,18 +91,72 @@ class CommandCategory(Enum):
     PROCESS = "process"
 
 
-@dataclass
+# Intern enum values and precompute member -> str maps; a dict lookup is
+# cheaper than the .value descriptor on hot logging/keying paths
+for _member in (*PermissionLevel, *CommandCategory):
+    _member._value_ = sys.intern(_member._value_)
+del _member
+
+PERMISSION_STR: Dict[PermissionLevel, str] = {m: m.value for m in PermissionLevel}
+CATEGORY_STR: Dict[CommandCategory, str] = {m: m.value for m in CommandCategory}
+
+
+@functools.lru_cache(maxsize=256)
+def _which(name: str) -> Optional[str]:
+    """Resolve an executable on PATH once per name"""
+    return shutil.which(name)
+
+
+# (epoch second, formatted timestamp); swapped as a whole so threads never see a torn pair
+_ts_cache: Tuple[int, str] = (0, "")
+
+
+def _now_iso() -> str:
+    """UTC ISO timestamp at 1-second resolution, formatted once per second"""
+    global _ts_cache
+    now = int(time.time())
+    cached = _ts_cache
+    if cached[0] != now:
+        # Naive like the utcnow() stamps in existing logs (no +00:00 suffix)
+        stamp = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None)
+        cached = _ts_cache = (now, stamp.isoformat())
+    return cached[1]
+
+
+class AuditFsyncMode(Enum):
+    """Durability policy for audit log writes"""
+    NONE = "none"  # Write through, leave flushing to the OS
+    PER_BATCH = "per_batch"  # Buffer records, fdatasync once per batch
+    PER_RECORD = "per_record"  # fdatasync after every record
+
+
+# os.fdatasync is not available on Windows/macOS
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+@dataclass(slots=True, frozen=True)
 class CommandRule:
-    """Security rule for a command"""
+    """Security rule for a command (immutable, hashable)"""
     pattern: str  # Command pattern (e.g., "ls", "open *")
     category: CommandCategory
     permission: PermissionLevel
     description: str
     max_execution_time: int = 30  # seconds
     allow_sudo: bool = False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready dict with enum values (cheaper than asdict())"""
+        return {
+            "pattern": self.pattern,
+            "category": CATEGORY_STR[self.category],
+            "permission": PERMISSION_STR[self.permission],
+            "description": self.description,
+            "max_execution_time": self.max_execution_time,
+            "allow_sudo": self.allow_sudo,
+        }
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AuditLog:
     """Audit log entry for system operations"""
     timestamp: str
@@ -66,7 +169,19 @@ class AuditLog:
     
     def __post_init__(self):
         if not self.timestamp:
-            self.timestamp = datetime.utcnow().isoformat()
+            object.__setattr__(self, "timestamp", _now_iso())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict for the audit log, without asdict() overhead"""
+        return {
+            "timestamp": self.timestamp,
+            "user_id": self.user_id,
+            "command": self.command,
+            "category": self.category,
+            "approved": self.approved,
+            "result": self.result,
+            "error": self.error,
+        }
 
 
 class SafePathValidator:
@@ -105,6 +220,10 @@ class SafePathValidator:
                 "/root",
                 "/.ssh",
             ]
+        
+        # str.startswith() takes a tuple and checks every prefix in C
+        self._forbidden_tuple = tuple(self.forbidden_paths)
+        self._allowed_tuple = tuple(self.allowed_base_dirs)
     
     def is_safe_path(self, path: str) -> Tuple[bool, Optional[str]]:
         """
@@ -112,21 +231,17 @@ class SafePathValidator:
         Returns: (is_safe, error_message)
         """
         try:
-            # Resolve to absolute path and normalize
-            abs_path = Path(path).resolve()
+            # Resolve to absolute path and normalize. Never cached: a path
+            # checked once can be swapped for a symlink somewhere forbidden
+            abs_path = os.path.realpath(os.path.abspath(path))
             
             # Check forbidden paths
-            for forbidden in self.forbidden_paths:
-                if str(abs_path).startswith(forbidden):
-                    return False, f"Access denied: {forbidden} is protected"
+            if abs_path.startswith(self._forbidden_tuple):
+                forbidden = next(f for f in self._forbidden_tuple if abs_path.startswith(f))
+                return False, f"Access denied: {forbidden} is protected"
             
             # Check if within allowed base directories
-            is_allowed = any(
-                str(abs_path).startswith(base_dir)
-                for base_dir in self.allowed_base_dirs
-            )
-            
-            if not is_allowed:
+            if not abs_path.startswith(self._allowed_tuple):
                 return False, f"Path outside allowed directories"
             
             return True, None
@@ -138,36 +253,85 @@ class SafePathValidator:
 class CommandAllowlist:
     """Manages allowed commands and their security rules"""
     
+    # Fold the append-only delta file into config_path past these sizes
+    DELTA_MAX_ENTRIES = 100
+    DELTA_MAX_BYTES = 64 * 1024
+    
     def __init__(self, config_path: str = "command_allowlist.json"):
         self.config_path = config_path
+        self.delta_path = str(Path(config_path).with_suffix(".delta.jsonl"))
         self.rules: Dict[str, CommandRule] = {}
+        self._delta_entries = 0
+        # Per-instance memo of allowlist decisions keyed by base command
+        self._lookup = functools.lru_cache(maxsize=256)(self._lookup_uncached)
+        # Glob rules (e.g. "open *") compiled into a single alternation
+        self._pattern_re: Optional[re.Pattern] = None
+        self._pattern_keys: Dict[str, str] = {}
         self._load_rules()
     
+    @staticmethod
+    def _rule_from_dict(rule_data: Dict[str, Any]) -> CommandRule:
+        """Build a rule from its stored JSON form"""
+        rule_data = dict(rule_data)
+        rule_data['category'] = CommandCategory(rule_data['category'])
+        rule_data['permission'] = PermissionLevel(rule_data['permission'])
+        return CommandRule(**rule_data)
+    
     def _load_rules(self):
-        """Load command rules from config"""
+        """Load command rules from config, then replay the delta file"""
         try:
-            with open(self.config_path, 'r') as f:
-                data = json.load(f)
-                for key, rule_data in data.items():
-                    rule_data['category'] = CommandCategory(rule_data['category'])
-                    rule_data['permission'] = PermissionLevel(rule_data['permission'])
-                    self.rules[key] = CommandRule(**rule_data)
+            data = _json_load_file(self.config_path)
+            for key, rule_data in data.items():
+                self.rules[key] = self._rule_from_dict(rule_data)
             logger.info(f"Loaded {len(self.rules)} command rules")
         except FileNotFoundError:
             logger.warning("No allowlist found, initializing defaults")
             self._initialize_default_rules()
+        
+        self._replay_delta()
+        self._rules_changed()
+    
+    def _replay_delta(self):
+        """Apply rule changes appended since the last compaction"""
+        self._delta_entries = 0
+        try:
+            with open(self.delta_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = _json_loads(line)
+                    except ValueError:
+                        break  # Torn final write from a crash
+                    if record.get("op") == "add":
+                        self.rules[record["key"]] = self._rule_from_dict(record["rule"])
+                    self._delta_entries += 1
+        except FileNotFoundError:
+            pass
     
     def _save_rules(self):
         """Persist rules to storage"""
-        data = {}
-        for key, rule in self.rules.items():
-            rule_dict = asdict(rule)
-            rule_dict['category'] = rule.category.value
-            rule_dict['permission'] = rule.permission.value
-            data[key] = rule_dict
+        data = {key: rule.to_dict() for key, rule in self.rules.items()}
         
-        with open(self.config_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        _json_dump_file(data, self.config_path)
+    
+    def _append_delta(self, record: Dict[str, Any]):
+        """Append one rule change instead of rewriting the whole allowlist"""
+        fd = os.open(self.delta_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (_json_dumps(record) + "\n").encode("utf-8"))
+            delta_size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        
+        self._delta_entries += 1
+        if self._delta_entries >= self.DELTA_MAX_ENTRIES or delta_size >= self.DELTA_MAX_BYTES:
+            self._compact()
+    
+    def _compact(self):
+        """Rewrite the full allowlist and drop the delta file"""
+        self._save_rules()
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._delta_entries = 0
     
     def _initialize_default_rules(self):
         """Set up default safe command rules"""
@@ -225,22 +389,57 @@ class CommandAllowlist:
             })
         
         self.rules = defaults
+        self._rules_changed()
         self._save_rules()
     
-    def get_rule(self, command: str) -> Optional[CommandRule]:
-        """Get rule for a command (base command only)"""
-        base_cmd = command.split()[0] if command else ""
-        return self.rules.get(base_cmd)
+    def add_rule(self, key: str, rule: CommandRule):
+        """Add or replace a rule, persist it and invalidate cached decisions"""
+        self.rules[key] = rule
+        self._rules_changed()
+        self._append_delta({"op": "add", "key": key, "rule": rule.to_dict()})
     
-    def is_allowed(self, command: str) -> Tuple[bool, Optional[CommandRule], Optional[str]]:
-        """
-        Check if command is allowed
-        Returns: (is_allowed, rule, error_message)
-        """
-        base_cmd = command.split()[0] if command else ""
+    def _rules_changed(self):
+        """Drop cached decisions and recompile glob patterns"""
+        self._lookup.cache_clear()
         
+        self._pattern_keys = {}
+        alternatives = []
+        for key, rule in self.rules.items():
+            if any(ch in rule.pattern for ch in "*?["):
+                # fnmatch.translate emits its own (?P<gN>...) groups on some versions
+                group = f"_rule{len(alternatives)}"
+                self._pattern_keys[group] = key
+                alternatives.append(f"(?P<{group}>{fnmatch.translate(rule.pattern)})")
+        self._pattern_re = re.compile("|".join(alternatives)) if alternatives else None
+    
+    def _match_pattern(self, command: str) -> Optional[CommandRule]:
+        """Find the first glob rule matching the full command"""
+        if self._pattern_re is None:
+            return None
+        m = self._pattern_re.match(command)
+        return self.rules[self._pattern_keys[m.lastgroup]] if m else None
+    
+    @staticmethod
+    def _base_command(command: str) -> str:
+        """First token of a command, without splitting the whole string"""
+        parts = command.split(None, 1)
+        return parts[0] if parts else ""
+    
+    def get_rule(self, command: str) -> Optional[CommandRule]:
+        """Get rule for a command (base command, then glob patterns)"""
+        rule = self.rules.get(self._base_command(command))
+        return rule if rule else self._match_pattern(command)
+    
+    def _lookup_uncached(self, base_cmd: str) -> Tuple[bool, Optional[CommandRule], Optional[str]]:
+        """Allowlist decision for a base command (memoized in __init__)"""
+        return self._check_rule(base_cmd, self.rules.get(base_cmd))
+    
+    @staticmethod
+    def _check_rule(
+        base_cmd: str, rule: Optional[CommandRule]
+    ) -> Tuple[bool, Optional[CommandRule], Optional[str]]:
+        """Allowlist decision for a resolved rule"""
         # Check if command exists in allowlist
-        rule = self.get_rule(command)
         if not rule:
             return False, None, f"Command '{base_cmd}' not in allowlist"
         
@@ -248,33 +447,103 @@ class CommandAllowlist:
         if rule.permission == PermissionLevel.NEVER_ALLOW:
             return False, rule, f"Command '{base_cmd}' is blocked"
         
-        # Check sudo
+        return True, rule, None
+    
+    def is_allowed(self, command: str) -> Tuple[bool, Optional[CommandRule], Optional[str]]:
+        """
+        Check if command is allowed
+        Returns: (is_allowed, rule, error_message)
+        """
+        base_cmd = self._base_command(command)
+        is_allowed, rule, error = self._lookup(base_cmd)
+        if rule is None and self._pattern_re is not None:
+            # Not an exact base command; try glob rules on the full command
+            rule = self._match_pattern(command)
+            if rule is not None:
+                is_allowed, rule, error = self._check_rule(base_cmd, rule)
+        if not is_allowed:
+            return is_allowed, rule, error
+        
+        # Check sudo (depends on the full command, so never cached)
         if "sudo" in command and not rule.allow_sudo:
             return False, rule, "Sudo not allowed for this command"
         
         return True, rule, None
 
 
+# Live PermissionManagers, flushed by one exit hook without keeping them alive
+_permission_managers: "weakref.WeakSet[PermissionManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_permission_managers():
+    for manager in list(_permission_managers):
+        manager._flush()
+
+
 class PermissionManager:
     """Manages user permissions and remembered decisions"""
     
+    # Compact the WAL into storage_path after this many changes, or once the
+    # oldest unflushed change is this many seconds old
+    FLUSH_EVERY_N = 16
+    FLUSH_EVERY_SECONDS = 2.0
+    
     def __init__(self, storage_path: str = "permissions.json"):
         self.storage_path = storage_path
+        self.wal_path = str(Path(storage_path).with_suffix(".wal"))
         self.remembered_permissions: Dict[str, bool] = {}
+        self._dirty_count = 0
+        self._dirty_since: Optional[float] = None  # When the first unflushed change was made
         self._load_permissions()
+        _permission_managers.add(self)
     
     def _load_permissions(self):
-        """Load remembered permissions"""
+        """Load remembered permissions, then replay decisions from the WAL"""
         try:
-            with open(self.storage_path, 'r') as f:
-                self.remembered_permissions = json.load(f)
+            self.remembered_permissions = _json_load_file(self.storage_path)
         except FileNotFoundError:
             self.remembered_permissions = {}
+        
+        try:
+            with open(self.wal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = _json_loads(line)
+                    except ValueError:
+                        break  # Torn final write from a crash
+                    self.remembered_permissions[record["key"]] = record["approved"]
+        except FileNotFoundError:
+            pass
+    
+    def _remember(self, perm_key: str, approved: bool):
+        """Record a decision in memory and append it to the WAL"""
+        self.remembered_permissions[perm_key] = approved
+        with open(self.wal_path, 'a') as f:
+            f.write(_json_dumps({"key": perm_key, "approved": approved}) + "\n")
+            # The WAL is what makes batching the JSON rewrite safe
+            f.flush()
+            os.fsync(f.fileno())
+        self._save_permissions()
     
     def _save_permissions(self):
-        """Save remembered permissions"""
-        with open(self.storage_path, 'w') as f:
-            json.dump(self.remembered_permissions, f, indent=2)
+        """Mark permissions dirty; rewrite the file once per batch"""
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        self._dirty_count += 1
+        if (self._dirty_count >= self.FLUSH_EVERY_N
+                or now - self._dirty_since > self.FLUSH_EVERY_SECONDS):
+            self._flush()
+    
+    def _flush(self):
+        """Save remembered permissions and truncate the WAL"""
+        if self._dirty_count:
+            _json_dump_file(self.remembered_permissions, self.storage_path)
+            if os.path.exists(self.wal_path):
+                os.remove(self.wal_path)
+        self._dirty_count = 0
+        self._dirty_since = None
     
     def check_permission(
         self, 
@@ -303,6 +572,8 @@ class PermissionManager:
         
         # ASK_ONCE: check if already remembered
         if rule.permission == PermissionLevel.ASK_ONCE:
+            if perm_key not in self.remembered_permissions:
+                self._migrate_legacy_key(perm_key)
             if perm_key in self.remembered_permissions:
                 return self.remembered_permissions[perm_key]
         
@@ -312,8 +583,7 @@ class PermissionManager:
             
             # Remember if ASK_ONCE
             if rule.permission == PermissionLevel.ASK_ONCE:
-                self.remembered_permissions[perm_key] = approved
-                self._save_permissions()
+                self._remember(perm_key, approved)
             
             return approved
         
@@ -323,8 +593,15 @@ class PermissionManager:
     
     def _generate_permission_key(self, command: str, rule: CommandRule) -> str:
         """Generate unique key for permission"""
-        key_data = f"{rule.pattern}:{rule.category.value}"
-        return hashlib.md5(key_data.encode()).hexdigest()
+        # The key is only used for dict lookups, so no hashing is needed
+        return f"{rule.pattern}:{CATEGORY_STR[rule.category]}"
+    
+    def _migrate_legacy_key(self, perm_key: str):
+        """Move a decision stored under the old MD5 key to the plain key"""
+        legacy_key = hashlib.md5(perm_key.encode()).hexdigest()
+        if legacy_key in self.remembered_permissions:
+            self.remembered_permissions[perm_key] = self.remembered_permissions.pop(legacy_key)
+            self._save_permissions()
     
     def revoke_permission(self, command: str):
         """Revoke remembered permission for a command"""
@@ -334,14 +611,117 @@ class PermissionManager:
         ]
         for key in keys_to_remove:
             del self.remembered_permissions[key]
-        self._save_permissions()
+        
+        # Revocations are written out immediately so they survive a crash
+        self._dirty_count += 1
+        self._flush()
+
+
+class AuditFileHandler(logging.FileHandler):
+    """
+    File handler with an explicit fsync policy for audit records
+    
+    NONE writes every record straight to the file, PER_RECORD also
+    fdatasyncs it, PER_BATCH buffers records in memory and writes +
+    fdatasyncs them together after `batch_size` records, `batch_bytes`
+    of output or `batch_interval` seconds (at most one batch is lost on
+    a crash). In PER_BATCH mode a background thread enforces the
+    interval even when no new records arrive.
+    """
+    
+    def __init__(
+        self,
+        filename: str,
+        fsync_mode: AuditFsyncMode = AuditFsyncMode.PER_BATCH,
+        batch_size: int = 32,
+        batch_interval: float = 0.2,
+        batch_bytes: int = 64 * 1024
+    ):
+        super().__init__(filename, delay=True)
+        self.fsync_mode = fsync_mode
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.batch_bytes = batch_bytes
+        
+        # Open once; O_APPEND keeps concurrent writers from clobbering each other
+        self.fd = os.open(self.baseFilename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._buffer = bytearray()
+        self._pending = 0
+        
+        self._stop = threading.Event()
+        self._flusher = None
+        if fsync_mode == AuditFsyncMode.PER_BATCH:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="sarkar-audit-flush", daemon=True
+            )
+            self._flusher.start()
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            msg = self.format(record) + self.terminator
+            self._buffer += msg.encode("utf-8")
+            self._pending += 1
+            
+            if (self.fsync_mode != AuditFsyncMode.PER_BATCH
+                    or self._pending >= self.batch_size
+                    or len(self._buffer) >= self.batch_bytes):
+                self._flush_batch()
+        except Exception:
+            self.handleError(record)
+    
+    def _flush_loop(self):
+        """Flush whatever is buffered every batch_interval seconds"""
+        while not self._stop.wait(self.batch_interval):
+            if self._buffer:
+                self.flush()
+    
+    def _flush_batch(self):
+        """Write buffered records and sync according to the fsync mode"""
+        if self._buffer and self.fd is not None:
+            with memoryview(self._buffer) as view:
+                written = 0
+                while written < len(view):
+                    written += os.write(self.fd, view[written:])
+            self._buffer.clear()
+            if self.fsync_mode != AuditFsyncMode.NONE:
+                _fdatasync(self.fd)
+        self._pending = 0
+    
+    def flush(self):
+        self.acquire()
+        try:
+            self._flush_batch()
+        finally:
+            self.release()
+    
+    def close(self):
+        # Stop the flusher before taking the lock it may be waiting on
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        
+        self.acquire()
+        try:
+            self._flush_batch()
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+        finally:
+            self.release()
+        super().close()
 
 
 class AuditLogger:
     """Logs all system operations for security auditing"""
     
-    def __init__(self, log_path: str = "system_audit.log"):
+    def __init__(
+        self,
+        log_path: str = "system_audit.log",
+        fsync_mode: AuditFsyncMode = AuditFsyncMode.PER_BATCH
+    ):
         self.log_path = log_path
+        self.fsync_mode = fsync_mode
         self._setup_logger()
     
     def _setup_logger(self):
@@ -349,30 +729,121 @@ class AuditLogger:
         self.audit_logger = logging.getLogger("sarkar_audit")
         self.audit_logger.setLevel(logging.INFO)
         
-        handler = logging.FileHandler(self.log_path)
-        handler.setFormatter(
+        self.handler = AuditFileHandler(self.log_path, self.fsync_mode)
+        self.handler.setFormatter(
             logging.Formatter('%(asctime)s | %(message)s')
         )
-        self.audit_logger.addHandler(handler)
+        self.audit_logger.addHandler(self.handler)
     
     def log(self, entry: AuditLog):
         """Log an audit entry"""
-        log_data = asdict(entry)
-        self.audit_logger.info(json.dumps(log_data))
+        self.log_dict(entry.to_dict())
+    
+    def log_dict(self, data: Dict[str, Any]):
+        """Log an audit record already shaped like AuditLog.to_dict()"""
+        self.audit_logger.info(_json_dumps(data))
     
     def get_recent_logs(self, n: int = 50) -> List[Dict]:
         """Get recent audit logs"""
+        # Make buffered records visible before reading the file back
+        self.handler.flush()
+        
         logs = []
         try:
-            with open(self.log_path, 'r') as f:
-                lines = f.readlines()[-n:]
-                for line in lines:
-                    if '|' in line:
-                        log_json = line.split('|', 1)[1].strip()
-                        logs.append(json.loads(log_json))
+            for line in self._tail_lines(n):
+                if b'|' in line:
+                    log_json = line.split(b'|', 1)[1].strip()
+                    logs.append(_json_loads(log_json))
         except FileNotFoundError:
             pass
         return logs
+    
+    def _tail_lines(self, n: int, chunk_size: int = 8192) -> List[bytes]:
+        """Read the last n lines by seeking backwards from the end of the log"""
+        if n <= 0:
+            return []
+        
+        with open(self.log_path, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            chunks = []
+            newlines = 0
+            # n + 1 newlines guarantee n complete lines after the first partial one
+            while pos > 0 and newlines <= n:
+                read_size = min(chunk_size, pos)
+                pos -= read_size
+                f.seek(pos)
+                chunk = f.read(read_size)
+                chunks.append(chunk)
+                newlines += chunk.count(b'\n')
+        
+        lines = b''.join(reversed(chunks)).splitlines()
+        if pos > 0:
+            lines = lines[1:]  # Drop the line cut by the chunk boundary
+        return lines[-n:]
+
+
+# Commands matching any of these are refused before the allowlist lookup
+DANGEROUS_COMMAND_PATTERNS = (
+    r"\bsudo\b",
+    r"\brm\s+-(?:rf|fr)\b",
+    r"\bmkfs\b",
+    r"\bdd\s+if=",
+    r":\(\)\s*\{",  # Fork bomb
+)
+# One alternation, so the check is a single C-level scan of the command
+_DANGEROUS_RE = re.compile("|".join(f"(?:{p})" for p in DANGEROUS_COMMAND_PATTERNS))
+
+
+# cmd.exe builtins: these have no executable, so they run through `cmd /c`
+_CMD_BUILTINS = frozenset({
+    "dir", "type", "copy", "move", "ren", "rename", "del", "erase", "rmdir", "rd",
+    "mkdir", "md", "cd", "chdir", "echo", "date", "time", "start", "cls", "ver", "vol",
+})
+_CMD_SPECIAL_RE = re.compile(r'([&|<>()^!])')
+
+
+def _cmd_line(argv: List[str]) -> str:
+    """Join argv into a cmd.exe command line with its metacharacters escaped"""
+    parts = []
+    for arg in argv:
+        # cmd expands %VAR% before it looks at carets or quotes, so no
+        # escaping can keep a percent sign literal
+        for ch in '"%':
+            if ch in arg:
+                raise ValueError(f"Unsupported character {ch!r} in argument: {arg}")
+        if not arg or any(c.isspace() for c in arg):
+            parts.append(f'"{arg}"')  # Metacharacters are literal inside quotes
+        else:
+            parts.append(_CMD_SPECIAL_RE.sub(r"^\1", arg))
+    return " ".join(parts)
+
+
+def _posix_cd(argv: List[str]) -> subprocess.CompletedProcess:
+    """`cd` as a shell builtin: report or check a directory without changing ours"""
+    if len(argv) > 2:
+        return subprocess.CompletedProcess(argv, 1, "", "cd: too many arguments\n")
+    if len(argv) == 1:
+        return subprocess.CompletedProcess(argv, 0, os.getcwd() + "\n", "")
+    target = os.path.expanduser(argv[1])
+    if not os.path.isdir(target):
+        return subprocess.CompletedProcess(argv, 1, "", f"cd: {argv[1]}: No such directory\n")
+    return subprocess.CompletedProcess(argv, 0, os.path.realpath(target) + "\n", "")
+
+
+def _posix_time(argv: List[str]) -> subprocess.CompletedProcess:
+    """`time` as on Windows: show the current time"""
+    # Timing another command is refused; that command would skip the allowlist
+    if len(argv) > 1:
+        return subprocess.CompletedProcess(argv, 1, "", "time: timing other commands is not supported\n")
+    return subprocess.CompletedProcess(argv, 0, datetime.now().strftime("%H:%M:%S") + "\n", "")
+
+
+# Shell builtins emulated in-process on POSIX, where they have no executable
+_POSIX_BUILTINS = {"cd": _posix_cd, "time": _posix_time}
+
+# Chunk size and default cap for SystemControlAgent.read_file
+READ_CHUNK_SIZE = 64 * 1024
+MAX_READ_BYTES = 1024 * 1024
 
 
 class SystemControlAgent:
@@ -381,29 +852,66 @@ class SystemControlAgent:
     Handles app launching, file operations, and terminal commands
     """
     
+    # Fixed rules for file operations, shared instead of rebuilt per call
+    _READ_RULE = CommandRule("read", CommandCategory.FILE_READ, PermissionLevel.ASK_ONCE, "Read file")
+    _WRITE_RULE = CommandRule("write", CommandCategory.FILE_WRITE, PermissionLevel.ASK_ALWAYS, "Write file")
+    _DELETE_RULE = CommandRule("delete", CommandCategory.FILE_DELETE, PermissionLevel.ASK_ALWAYS, "Delete file")
+    
     def __init__(
         self,
         user_id: str = "default_user",
-        permission_callback: Optional[callable] = None
+        permission_callback: Optional[callable] = None,
+        audit_fsync_mode: AuditFsyncMode = AuditFsyncMode.PER_BATCH,
+        audit_sample_rate: Optional[Dict[CommandCategory, float]] = None
     ):
+        """
+        Args:
+            audit_sample_rate: Fraction (0.0-1.0) of successful ALWAYS_ALLOW
+                operations to audit, per category, e.g.
+                {CommandCategory.SYSTEM_INFO: 0.01}. Unlisted categories
+                are always logged. Blocked, denied and failed operations,
+                and anything that needed permission, are never sampled.
+                Sampling trades a complete trail of harmless commands
+                (pwd, date, ls) for less audit I/O; leave it unset where a
+                full audit record is required.
+        """
         self.user_id = user_id
         self.permission_callback = permission_callback
-        
-        # Initialize security components
-        self.path_validator = SafePathValidator()
-        self.allowlist = CommandAllowlist()
-        self.permission_manager = PermissionManager()
-        self.audit_logger = AuditLogger()
+        self.audit_fsync_mode = audit_fsync_mode
+        self.audit_sample_rate: Dict[CommandCategory, float] = dict(audit_sample_rate or {})
         
         # Detect OS
         self.os_type = platform.system()
         
         logger.info(f"SystemControlAgent initialized for {self.os_type}")
     
-    def execute_command(self, command: str) -> Dict[str, Any]:
+    # Security components are built on first use, so constructing an agent
+    # does no file I/O until an operation actually needs it
+    
+    @functools.cached_property
+    def path_validator(self) -> SafePathValidator:
+        return SafePathValidator()
+    
+    @functools.cached_property
+    def allowlist(self) -> CommandAllowlist:
+        return CommandAllowlist()
+    
+    @functools.cached_property
+    def permission_manager(self) -> PermissionManager:
+        return PermissionManager()
+    
+    @functools.cached_property
+    def audit_logger(self) -> AuditLogger:
+        return AuditLogger(fsync_mode=self.audit_fsync_mode)
+    
+    def execute_command(self, command: str, argv: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Safely execute a terminal command
         
+        The command runs without a shell, so shell operators (;, &&, |)
+        are passed through as plain arguments. Pass `argv` to skip parsing
+        `command` when the arguments are already split.
+        
         Returns: {
             "success": bool,
             "output": str,
@@ -411,38 +919,77 @@ class SystemControlAgent:
             "approved": bool
         }
         """
+        # Bind hot attributes once; each is used on several branches below
+        log = self._log_audit
+        
+        # Refuse known-dangerous patterns outright
+        match = _DANGEROUS_RE.search(command)
+        if match:
+            error = f"Command blocked: dangerous pattern '{match.group(0)}'"
+            log(command, CommandCategory.PROCESS, False, f"Blocked: {error}", error)
+            return {"success": False, "output": "", "error": error, "approved": False}
+        
         # Check allowlist
         is_allowed, rule, error = self.allowlist.is_allowed(command)
         if not is_allowed:
-            self._log_audit(command, CommandCategory.PROCESS, False, f"Blocked: {error}", error)
+            log(command, CommandCategory.PROCESS, False, f"Blocked: {error}", error)
             return {"success": False, "output": "", "error": error, "approved": False}
         
         # Check permission
+        category = rule.category
         approved = self.permission_manager.check_permission(
             command, rule, self.permission_callback
         )
         
         if not approved:
             error = "User denied permission"
-            self._log_audit(command, rule.category, False, "Denied by user", error)
+            log(command, category, False, "Denied by user", error)
             return {"success": False, "output": "", "error": error, "approved": False}
         
         # Execute command safely
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=rule.max_execution_time,
-                check=False
-            )
+            if argv is None:
+                argv = shlex.split(command, posix=(self.os_type != "Windows"))
+            
+            if not argv:
+                raise ValueError("Empty command")
+            
+            name = argv[0].lower()
+            builtin = None
+            if self.os_type == "Windows" and name in _CMD_BUILTINS:
+                # /s keeps cmd from re-parsing the outer quotes and /v:off
+                # from expanding !VAR!; the line is escaped, so only the
+                # builtin itself is interpreted
+                comspec = os.environ.get("COMSPEC", "cmd.exe")
+                run_args = f'"{comspec}" /d /v:off /s /c "{_cmd_line(argv)}"'
+            elif self.os_type != "Windows" and argv[0] in _POSIX_BUILTINS:
+                builtin = _POSIX_BUILTINS[argv[0]]
+            else:
+                executable = _which(argv[0])
+                if not executable:
+                    raise FileNotFoundError(f"'{argv[0]}' not found on PATH")
+                run_args = [executable] + argv[1:]
+            
+            if builtin is not None:
+                result = builtin(argv)
+            else:
+                result = subprocess.run(
+                    run_args,
+                    stdin=subprocess.DEVNULL,
+                    capture_output=True,
+                    text=True,
+                    timeout=rule.max_execution_time,
+                    check=False
+                )
             
             output = result.stdout
             error = result.stderr if result.returncode != 0 else None
             success = result.returncode == 0
             
-            self._log_audit(command, rule.category, True, output[:200], error)
+            log(
+                command, category, True, output[:200], error,
+                sampled=success and rule.permission == PermissionLevel.ALWAYS_ALLOW
+            )
             
             return {
                 "success": success,
@@ -454,12 +1001,12 @@ class SystemControlAgent:
             
         except subprocess.TimeoutExpired:
             error = f"Command timeout after {rule.max_execution_time}s"
-            self._log_audit(command, rule.category, False, "Timeout", error)
+            log(command, category, False, "Timeout", error)
             return {"success": False, "output": "", "error": error, "approved": True}
         
         except Exception as e:
             error = f"Execution error: {str(e)}"
-            self._log_audit(command, rule.category, False, "Exception", error)
+            log(command, category, False, "Exception", error)
             return {"success": False, "output": "", "error": error, "approved": True}
     
     def open_application(self, app_name: str) -> Dict[str, Any]:
@@ -467,67 +1014,169 @@ class SystemControlAgent:
         Open an application safely
         Cross-platform: macOS, Windows, Linux
         """
-        command = None
+        argv = None
         
         if self.os_type == "Darwin":  # macOS
-            command = f"open -a '{app_name}'"
+            argv = ["open", "-a", app_name]
         elif self.os_type == "Windows":
-            command = f"start {app_name}"
+            argv = ["start", app_name]
         elif self.os_type == "Linux":
-            command = f"xdg-open {app_name} &"
+            argv = ["xdg-open", app_name]
         
-        if not command:
+        if not argv:
             return {"success": False, "error": f"Unsupported OS: {self.os_type}"}
         
+        if self.os_type == "Windows":
+            command = subprocess.list2cmdline(argv)
+        else:
+            command = shlex.join(argv)
+        
         # Add to allowlist if not present
         if "open" not in self.allowlist.rules:
-            self.allowlist.rules["open"] = CommandRule(
+            self.allowlist.add_rule("open", CommandRule(
                 "open", CommandCategory.APP_LAUNCH, 
                 PermissionLevel.ASK_ONCE, "Open application"
-            )
+            ))
         
-        return self.execute_command(command)
+        return self.execute_command(command, argv)
     
-    def read_file(self, file_path: str) -> Dict[str, Any]:
-        """Safely read a file"""
+    def _authorize_read(self, file_path: str) -> Tuple[str, Optional[str]]:
+        """
+        Validate path and permission for reading a file
+        Returns: (command, error_message)
+        """
+        command = f"read {file_path}"
+        
         # Validate path
         is_safe, error = self.path_validator.is_safe_path(file_path)
         if not is_safe:
-            self._log_audit(f"read {file_path}", CommandCategory.FILE_READ, False, "Blocked", error)
-            return {"success": False, "error": error, "content": None}
+            self._log_audit(command, CommandCategory.FILE_READ, False, "Blocked", error)
+            return command, error
         
         # Check permission
-        command = f"read {file_path}"
-        rule = CommandRule("read", CommandCategory.FILE_READ, PermissionLevel.ASK_ONCE, "Read file")
+        rule = self._READ_RULE
         
         approved = self.permission_manager.check_permission(command, rule, self.permission_callback)
         if not approved:
-            return {"success": False, "error": "Permission denied", "content": None}
+            return command, "Permission denied"
+        
+        return command, None
+    
+    def read_file(
+        self,
+        file_path: str,
+        max_bytes: Optional[int] = MAX_READ_BYTES
+    ) -> Dict[str, Any]:
+        """
+        Safely read a file
+        
+        Reads at most `max_bytes` (None for no cap); "truncated" is True
+        when the file was longer than that.
+        """
+        log = self._log_audit
+        
+        command, error = self._authorize_read(file_path)
+        if error:
+            return {"success": False, "error": error, "content": None}
         
-        # Read file
+        # Read file in chunks so a huge file never becomes one allocation
         try:
-            with open(file_path, 'r') as f:
-                content = f.read()
+            buf = bytearray()
+            limit = None if max_bytes is None else max_bytes + 1
+            with open(file_path, 'rb') as f:
+                while limit is None or len(buf) < limit:
+                    size = READ_CHUNK_SIZE if limit is None else min(READ_CHUNK_SIZE, limit - len(buf))
+                    chunk = f.read(size)
+                    if not chunk:
+                        break
+                    buf += chunk
             
-            self._log_audit(command, CommandCategory.FILE_READ, True, f"Read {len(content)} bytes")
-            return {"success": True, "content": content, "error": None}
+            truncated = max_bytes is not None and len(buf) > max_bytes
+            if truncated:
+                del buf[max_bytes:]
+            # Decode like text-mode open(): locale encoding, strict errors,
+            # universal newlines. A non-final decode drops a character (or
+            # a \r\n) cut in half by the cap.
+            decoder = io.IncrementalNewlineDecoder(
+                codecs.getincrementaldecoder(locale.getpreferredencoding(False))(),
+                translate=True,
+            )
+            content = decoder.decode(bytes(buf), final=not truncated)
+            
+            log(command, CommandCategory.FILE_READ, True, f"Read {len(buf)} bytes")
+            return {"success": True, "content": content, "error": None, "truncated": truncated}
         
         except Exception as e:
             error = f"Read error: {str(e)}"
-            self._log_audit(command, CommandCategory.FILE_READ, False, "Error", error)
+            log(command, CommandCategory.FILE_READ, False, "Error", error)
             return {"success": False, "error": error, "content": None}
     
+    def stream_file(self, file_path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Safely stream a file as raw byte chunks
+        
+        Path and permission are checked and the file is opened up front;
+        raises PermissionError if the read is not allowed and OSError if
+        the file can't be opened.
+        """
+        command, error = self._authorize_read(file_path)
+        if error:
+            raise PermissionError(error)
+        
+        try:
+            f = open(file_path, 'rb')
+        except OSError as e:
+            error = f"Read error: {str(e)}"
+            self._log_audit(command, CommandCategory.FILE_READ, False, "Error", error)
+            raise
+        
+        self._log_audit(command, CommandCategory.FILE_READ, True, "Streaming")
+        return self._iter_file(f, chunk_size)
+    
+    def file_line_count(self, file_path: str) -> Dict[str, Any]:
+        """Safely count the lines in a file without decoding or splitting it"""
+        command, error = self._authorize_read(file_path)
+        if error:
+            return {"success": False, "error": error, "lines": None}
+        
+        try:
+            # bytes.count scans each 64 KiB chunk in C
+            lines = sum(chunk.count(b'\n') for chunk in self._iter_chunks(file_path, READ_CHUNK_SIZE))
+            self._log_audit(command, CommandCategory.FILE_READ, True, f"Counted {lines} lines")
+            return {"success": True, "lines": lines, "error": None}
+        
+        except Exception as e:
+            error = f"Read error: {str(e)}"
+            self._log_audit(command, CommandCategory.FILE_READ, False, "Error", error)
+            return {"success": False, "error": error, "lines": None}
+    
+    @classmethod
+    def _iter_chunks(cls, file_path: str, chunk_size: int) -> Iterator[bytes]:
+        return cls._iter_file(open(file_path, 'rb'), chunk_size)
+    
+    @staticmethod
+    def _iter_file(f, chunk_size: int) -> Iterator[bytes]:
+        """Yield chunks of an open binary file, closing it when done"""
+        with f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
     def write_file(self, file_path: str, content: str) -> Dict[str, Any]:
         """Safely write to a file"""
+        log = self._log_audit
+        
         # Validate path
         is_safe, error = self.path_validator.is_safe_path(file_path)
         if not is_safe:
-            self._log_audit(f"write {file_path}", CommandCategory.FILE_WRITE, False, "Blocked", error)
+            log(f"write {file_path}", CommandCategory.FILE_WRITE, False, "Blocked", error)
             return {"success": False, "error": error}
         
         # Check permission
         command = f"write {file_path}"
-        rule = CommandRule("write", CommandCategory.FILE_WRITE, PermissionLevel.ASK_ALWAYS, "Write file")
+        rule = self._WRITE_RULE
         
         approved = self.permission_manager.check_permission(command, rule, self.permission_callback)
         if not approved:
@@ -538,25 +1187,27 @@ class SystemControlAgent:
             with open(file_path, 'w') as f:
                 f.write(content)
             
-            self._log_audit(command, CommandCategory.FILE_WRITE, True, f"Wrote {len(content)} bytes")
+            log(command, CommandCategory.FILE_WRITE, True, f"Wrote {len(content)} bytes")
             return {"success": True, "error": None}
         
         except Exception as e:
             error = f"Write error: {str(e)}"
-            self._log_audit(command, CommandCategory.FILE_WRITE, False, "Error", error)
+            log(command, CommandCategory.FILE_WRITE, False, "Error", error)
             return {"success": False, "error": error}
     
     def delete_file(self, file_path: str) -> Dict[str, Any]:
         """Safely delete a file"""
+        log = self._log_audit
+        
         # Validate path
         is_safe, error = self.path_validator.is_safe_path(file_path)
         if not is_safe:
-            self._log_audit(f"delete {file_path}", CommandCategory.FILE_DELETE, False, "Blocked", error)
+            log(f"delete {file_path}", CommandCategory.FILE_DELETE, False, "Blocked", error)
             return {"success": False, "error": error}
         
         # Check permission (ALWAYS ask for deletes)
         command = f"delete {file_path}"
-        rule = CommandRule("delete", CommandCategory.FILE_DELETE, PermissionLevel.ASK_ALWAYS, "Delete file")
+        rule = self._DELETE_RULE
         
         approved = self.permission_manager.check_permission(command, rule, self.permission_callback)
         if not approved:
@@ -571,16 +1222,20 @@ class SystemControlAgent:
             else:
                 return {"success": False, "error": "Path not found"}
             
-            self._log_audit(command, CommandCategory.FILE_DELETE, True, "Deleted")
+            log(command, CommandCategory.FILE_DELETE, True, "Deleted")
             return {"success": True, "error": None}
         
         except Exception as e:
             error = f"Delete error: {str(e)}"
-            self._log_audit(command, CommandCategory.FILE_DELETE, False, "Error", error)
+            log(command, CommandCategory.FILE_DELETE, False, "Error", error)
             return {"success": False, "error": error}
     
-    def list_directory(self, dir_path: str = ".") -> Dict[str, Any]:
-        """Safely list directory contents"""
+    def list_directory(self, dir_path: str = ".", limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Safely list directory contents
+        
+        With `limit`, stops reading the directory after that many entries.
+        """
         # Validate path
         is_safe, error = self.path_validator.is_safe_path(dir_path)
         if not is_safe:
@@ -588,21 +1243,27 @@ class SystemControlAgent:
         
         # No permission needed for listing (safe operation)
         try:
-            path = Path(dir_path)
-            if not path.exists():
-                return {"success": False, "error": "Directory not found", "files": []}
-            
-            files = []
-            for item in path.iterdir():
-                files.append({
-                    "name": item.name,
-                    "type": "dir" if item.is_dir() else "file",
-                    "size": item.stat().st_size if item.is_file() else 0
-                })
+            # DirEntry caches the readdir type bits and a single stat result,
+            # so each entry costs at most one stat call
+            with os.scandir(dir_path) as entries:
+                files = [
+                    {
+                        "name": entry.name,
+                        "type": "dir" if entry.is_dir() else "file",
+                        "size": entry.stat().st_size if entry.is_file() else 0
+                    }
+                    for entry in islice(entries, limit)
+                ]
             
-            self._log_audit(f"ls {dir_path}", CommandCategory.FILE_READ, True, f"Listed {len(files)} items")
+            self._log_audit(
+                f"ls {dir_path}", CommandCategory.FILE_READ, True,
+                f"Listed {len(files)} items", sampled=True
+            )
             return {"success": True, "files": files, "error": None}
         
+        except FileNotFoundError:
+            return {"success": False, "error": "Directory not found", "files": []}
+        
         except Exception as e:
             error = f"List error: {str(e)}"
             return {"success": False, "error": error, "files": []}
@@ -613,22 +1274,32 @@ class SystemControlAgent:
         category: CommandCategory, 
         approved: bool, 
         result: str,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        sampled: bool = False
     ):
-        """Create audit log entry"""
-        entry = AuditLog(
-            timestamp=datetime.utcnow().isoformat(),
-            user_id=self.user_id,
-            command=command,
-            category=category.value,
-            approved=approved,
-            result=result,
-            error=error
-        )
-        self.audit_logger.log(entry)
+        """Create audit log entry (subject to audit_sample_rate if sampled)"""
+        if sampled and random.random() >= self.audit_sample_rate.get(category, 1.0):
+            return
+        
+        # Built as a dict directly; AuditLog stays the typed external API
+        self.audit_logger.log_dict({
+            "timestamp": _now_iso(),
+            "user_id": self.user_id,
+            "command": command,
+            "category": CATEGORY_STR[category],
+            "approved": approved,
+            "result": result,
+            "error": error,
+        })
     
     def get_audit_logs(self, n: int = 50) -> List[Dict]:
-        """Get recent audit logs"""
+        """
+        Get recent audit logs
+        
+        Always read from the tail of the audit log file, which also holds
+        other agents' records and earlier runs; the backwards seek keeps
+        that proportional to n rather than to the file size.
+        """
         return self.audit_logger.get_recent_logs(n)
 
 
@@ -641,7 +1312,7 @@ if __name__ == "__main__":
         print(f"   Description: {rule.description}")
         print(f"   Category: {rule.category.value}")
         response = input(f"   Approve? (y/n): ")
-        return response.lower() == 'y'
+        return response in ('y', 'Y')
     
     # Initialize agent
     agent = SystemControlAgent(
@@ -2,9 +2,19 @@
 Test script for Sarkar AI Assistant
 Run this to verify everything works
 """
+import io
+import os
 import sys
-from feature_flags import FeatureFlagManager, is_enabled, get_variant
-from system_control_agent import SystemControlAgent
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from feature_flags import FeatureFlagManager, get_flag_manager, is_enabled, get_variant
+
+# Status markers for the per-row report loops
+_GREEN, _RED = "🟢", "🔴"
+_OK, _FAIL = "  ✅ ", "  ❌ "
 
 
 def test_feature_flags():
@@ -13,59 +23,125 @@ def test_feature_flags():
     print("🚩 Testing Feature Flags")
     print("="*60)
     
-    # Initialize
-    flags = FeatureFlagManager()
+    # Share the manager behind is_enabled/get_variant, so the emergency
+    # disable below is visible to them without re-reading flags.json
+    flags = get_flag_manager()
+    user_id = "test_user_123"
+    
+    # Evaluate every flag the test needs once, up front
+    snapshot = {
+        "agents.web_search.enabled": is_enabled("agents.web_search.enabled"),
+        "features.proactive_suggestions": is_enabled("features.proactive_suggestions", user_id),
+        "agents.code_execution.enabled": is_enabled("agents.code_execution.enabled"),
+    }
+    model = get_variant("model.provider", user_id)
     
     # Test 1: Check if web search is enabled
-    if is_enabled("agents.web_search.enabled"):
+    if snapshot["agents.web_search.enabled"]:
         print("✅ Web search agent: ENABLED")
     else:
         print("❌ Web search agent: DISABLED")
     
     # Test 2: Check percentage rollout
-    user_id = "test_user_123"
-    if is_enabled("features.proactive_suggestions", user_id):
+    if snapshot["features.proactive_suggestions"]:
         print(f"✅ Proactive suggestions enabled for {user_id}")
     else:
         print(f"❌ Proactive suggestions disabled for {user_id}")
     
     # Test 3: Get A/B test variant
-    model = get_variant("model.provider", user_id)
     print(f"✅ Model variant for {user_id}: {model}")
     
-    # Test 4: Emergency disable
+    # Test 4: Emergency disable (refresh only the flag that changed)
     print("\n🔴 Testing emergency kill switch...")
     flags.emergency_disable("agents.code_execution.enabled")
-    if not is_enabled("agents.code_execution.enabled"):
+    snapshot["agents.code_execution.enabled"] = is_enabled("agents.code_execution.enabled")
+    if not snapshot["agents.code_execution.enabled"]:
         print("✅ Emergency disable works!")
     
     # Print all flags
     print("\n📋 All Feature Flags:")
     for key, flag in flags.get_all_flags().items():
-        status = "🟢" if flag['enabled'] else "🔴"
-        print(f"  {status} {key}")
+        print("  " + (_GREEN if flag.enabled else _RED) + " " + key)
+
+
+def test_flag_cache_concurrency():
+    """Flip a flag while other threads read it through the evaluation cache"""
+    print("\n" + "="*60)
+    print("🧵 Testing Feature Flag Cache Under Concurrency")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # A private manager, so flipping the flag doesn't touch flags.json
+        flags = FeatureFlagManager(os.path.join(tmp, "flags.json"))
+        key = "agents.web_search.enabled"
+        stop = threading.Event()
+        errors = []
+        
+        def reader(n):
+            try:
+                while not stop.is_set():
+                    # Distinct users keep inserts and evictions going too
+                    for i in range(50):
+                        flags.is_enabled(key, f"user_{n}_{i}")
+            except Exception as e:
+                errors.append(e)
+        
+        readers = [threading.Thread(target=reader, args=(n,)) for n in range(4)]
+        for thread in readers:
+            thread.start()
+        try:
+            for i in range(200):
+                flags.set_flag(key, i % 2 == 0, require_approval=False)
+        finally:
+            stop.set()
+            for thread in readers:
+                thread.join()
+        
+        if errors:
+            raise errors[0]
+        # The last write disabled the flag; no stale cached answer survives it
+        assert not flags.is_enabled(key, "user_0_0")
+        print("✅ Concurrent reads during flag updates: no errors, no stale values")
+
+
+# SARKAR_TEST_AUTO_APPROVE=1 approves and =0 denies non-safe requests
+# without prompting, so the suite can run unattended (CI, profiling)
+_AUTO_APPROVE = os.environ.get("SARKAR_TEST_AUTO_APPROVE")
+
+# Categories the mock callback approves without asking
+_SAFE_CATS = frozenset({"file_read", "system_info", "app_launch"})
 
 
 def mock_permission_callback(command: str, rule) -> bool:
     """Mock permission system for testing"""
+    cat = rule.category.value
     print(f"\n🔐 Permission Request:")
     print(f"   Command: {command}")
     print(f"   Description: {rule.description}")
-    print(f"   Category: {rule.category.value}")
+    print(f"   Category: {cat}")
     
     # Auto-approve for testing (in production, this would prompt user)
     # For demo: approve safe commands, deny dangerous ones
-    if rule.category.value in ["file_read", "system_info", "app_launch"]:
+    if cat in _SAFE_CATS:
         print("   ✅ AUTO-APPROVED (safe operation)")
         return True
     else:
         print("   ⚠️  Would ask user in production")
+        if _AUTO_APPROVE is not None:
+            return _AUTO_APPROVE == "1"
         response = input("   Approve? (y/n): ")
-        return response.lower() == 'y'
+        return response in ('y', 'Y')
 
 
 def test_system_control():
     """Test system control agent"""
+    # Imported here so running only the feature flag test stays cheap
+    from system_control_agent import SystemControlAgent
+    
+    # SARKAR_FAST=1 skips the subprocess and file-read tests (quick smoke run)
+    fast = os.environ.get("SARKAR_FAST") == "1"
+    started = time.perf_counter()
+    
     print("\n" + "="*60)
     print("🖥️  Testing System Control Agent")
     print("="*60)
@@ -81,18 +157,21 @@ def test_system_control():
     result = agent.list_directory(".")
     if result["success"]:
         print(f"✅ Found {len(result['files'])} items")
-        for item in result['files'][:5]:  # Show first 5
+        for item in islice(result['files'], 5):  # Show first 5
             print(f"   - {item['name']} ({item['type']})")
     else:
         print(f"❌ Error: {result['error']}")
     
     # Test 2: Execute safe command
     print("\n💻 Test 2: Execute safe command (pwd)")
-    result = agent.execute_command("cd")  # Windows equivalent of pwd
-    if result["success"]:
-        print(f"✅ Output: {result['output'].strip()}")
+    if fast:
+        print("⏭️  Skipped (SARKAR_FAST)")
     else:
-        print(f"❌ Error: {result['error']}")
+        result = agent.execute_command("cd")  # Windows equivalent of pwd
+        if result["success"]:
+            print(f"✅ Output: {result['output'].strip()}")
+        else:
+            print(f"❌ Error: {result['error']}")
     
     # Test 3: Try dangerous command (should be blocked)
     print("\n🚫 Test 3: Try dangerous command (should block)")
@@ -110,19 +189,83 @@ def test_system_control():
     
     # Test 5: Read a file (will ask permission)
     print("\n📖 Test 5: Read file (with permission)")
-    result = agent.read_file("test_sarkar.py")
-    if result["success"]:
-        lines = result['content'].split('\n')
-        print(f"✅ Read {len(lines)} lines from file")
+    if fast:
+        print("⏭️  Skipped (SARKAR_FAST)")
     else:
-        print(f"❌ Error: {result['error']}")
+        result = agent.file_line_count("test_sarkar.py")
+        if result["success"]:
+            print(f"✅ Read {result['lines']} lines from file")
+        else:
+            print(f"❌ Error: {result['error']}")
     
     # View audit logs
     print("\n📋 Recent Audit Logs:")
     logs = agent.get_audit_logs(10)
-    for log in logs:
-        status = "✅" if log['approved'] else "❌"
-        print(f"  {status} {log['command'][:30]} - {log['result'][:40]}")
+    # Build the whole report first and write it with a single call
+    report = "\n".join(
+        (_OK if log['approved'] else _FAIL) + log['command'][:30] + " - " + log['result'][:40]
+        for log in logs
+    )
+    if report:
+        sys.stdout.write(report + "\n")
+    
+    print(f"\n⏱️  System control tests took {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+class _ThreadBufferedStdout:
+    """stdout proxy that sends writes from registered threads to their own buffer"""
+    
+    def __init__(self, real):
+        self._real = real
+        self.local = threading.local()
+    
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer if buffer is not None else self._real).write(text)
+    
+    def __getattr__(self, name):
+        return getattr(self._real, name)
+
+
+def run_tests_concurrently(tests):
+    """
+    Run independent tests on threads so their I/O overlaps
+    
+    Each test's output is buffered and printed as one block, in order.
+    The first exception raised by a test is re-raised afterwards. input()
+    prompts would be buffered too, so without SARKAR_TEST_AUTO_APPROVE
+    the tests run one at a time with their output unbuffered.
+    """
+    if _AUTO_APPROVE is None:
+        for test in tests:
+            test()
+        return
+    
+    real_stdout = sys.stdout
+    proxy = _ThreadBufferedStdout(real_stdout)
+    
+    def run(test):
+        proxy.local.buffer = io.StringIO()
+        try:
+            test()
+            return proxy.local.buffer.getvalue(), None
+        except Exception as e:
+            return proxy.local.buffer.getvalue(), e
+        finally:
+            proxy.local.buffer = None
+    
+    sys.stdout = proxy
+    try:
+        with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+            results = list(executor.map(run, tests))
+    finally:
+        sys.stdout = real_stdout
+    
+    for output, _ in results:
+        real_stdout.write(output)
+    for _, error in results:
+        if error is not None:
+            raise error
 
 
 def main():
@@ -132,11 +275,9 @@ def main():
     print("="*60)
     
     try:
-        # Test feature flags
-        test_feature_flags()
-        
-        # Test system control
-        test_system_control()
+        # Feature flags and system control share no state, so run them together
+        run_tests_concurrently([test_feature_flags, test_system_control])
+        test_flag_cache_concurrency()
         
         print("\n" + "="*60)
         print("✅ ALL TESTS COMPLETED!")
@@ -149,8 +290,11 @@ def main():
         
     except Exception as e:
         print(f"\n❌ ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        if os.environ.get("SARKAR_DEBUG"):
+            import traceback
+            traceback.print_exc()
+        else:
+            print("   (set SARKAR_DEBUG=1 for the full traceback)")
 
 
 if __name__ == "__main__":
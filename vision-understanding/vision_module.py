@@ -11,13 +11,26 @@ Capabilities:
 - Error message extraction
 """
 
+from __future__ import annotations
+
 import os
 import sys
 import json
+import re
 import base64
+import hashlib
+import tempfile
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+from queue import Empty, Full, Queue
+from threading import Event, Thread
 import logging
 
 # Setup logging
@@ -27,33 +40,205 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-try:
-    from PIL import Image
-    import pytesseract
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    logger.warning("PIL not installed. Install: pip install Pillow pytesseract")
+# Imaging libraries are imported on first use by _load_vision_libs();
+# cv2 alone can take hundreds of ms, and most callers never analyze an image
+Image = pytesseract = cv2 = np = None
+PyTessBaseAPI = PSM = None
+PIL_AVAILABLE = CV2_AVAILABLE = TESSEROCR_AVAILABLE = False
+_vision_libs_loaded = False
 
-try:
-    import cv2
-    import numpy as np
-    CV2_AVAILABLE = True
-except ImportError:
-    CV2_AVAILABLE = False
-    logger.warning("OpenCV not installed. Install: pip install opencv-python")
+
+def _load_vision_libs():
+    """Import PIL, pytesseract, OpenCV and tesserocr once, setting the *_AVAILABLE flags"""
+    global Image, pytesseract, cv2, np, PyTessBaseAPI, PSM
+    global PIL_AVAILABLE, CV2_AVAILABLE, TESSEROCR_AVAILABLE, _vision_libs_loaded
+    if _vision_libs_loaded:
+        return
+    _vision_libs_loaded = True
+    
+    try:
+        from PIL import Image
+        import pytesseract
+        PIL_AVAILABLE = True
+    except ImportError:
+        PIL_AVAILABLE = False
+        logger.warning("PIL not installed. Install: pip install Pillow pytesseract")
+    
+    try:
+        import cv2
+        import numpy as np
+        CV2_AVAILABLE = True
+    except ImportError:
+        CV2_AVAILABLE = False
+        logger.warning("OpenCV not installed. Install: pip install opencv-python")
+    
+    # Optional: tesserocr keeps one Tesseract engine loaded instead of
+    # spawning the CLI (and reloading the model) for every OCR call
+    try:
+        from tesserocr import PyTessBaseAPI, PSM
+        TESSEROCR_AVAILABLE = True
+    except ImportError:
+        TESSEROCR_AVAILABLE = False
+
+
+# Code cleanup tables for _clean_code_text
+_PIPE_TO_I = str.maketrans('|', 'I')
+_DIGITS = frozenset('0123456789')
 
 
 class SARKAARVision:
     """Main vision processing class"""
     
-    def __init__(self):
+    # Images decoded ahead of the one being analyzed in analyze_images
+    PREFETCH_DEPTH = 4
+    
+    # Longest side, in pixels, of the image handed to tesseract
+    OCR_MAX_SIDE = 1600
+    
+    # Words tesseract is less sure of (0-100) are dropped by _ocr_lines
+    MIN_WORD_CONFIDENCE = 60
+    
+    # Smallest batch analyze_images spreads over the OCR process pool;
+    # smaller ones go through a single tesseract run over a list file
+    PARALLEL_OCR_MIN_IMAGES = 4
+    
+    # Analyses kept for repeat requests on identical image bytes
+    RESULT_CACHE_SIZE = 64
+    
+    # Entries kept in analysis_history, oldest dropped first
+    HISTORY_SIZE = 256
+    
+    # Tesseract page segmentation mode per analysis: 6 treats the image as one
+    # uniform text block and 11 as sparse text, both skipping full layout
+    # analysis. Types not listed ("ocr", "auto") use tesseract's default.
+    _PSM = {'code': 6, 'error': 6, 'terminal': 6, 'security': 6, 'diagram': 11}
+    
+    # Keyword tables for the text detectors, checked in order
+    _CODE_INDICATORS = ('def ', 'class ', 'function', 'import ', 'const ', 'var ',
+                        'public ', 'private ', '{', '}', 'if(', 'for(', '<?php')
+    _ERROR_INDICATORS = ('error', 'exception', 'traceback', 'failed', 'warning',
+                         'at line', 'syntax error', 'undefined')
+    _TERMINAL_INDICATORS = ('c:\\', 'ps ', '$ ', '~/', 'root@', 'admin@')
+    _ERROR_LINE_KEYWORDS = ('error', 'exception', 'failed', 'traceback')
+    _ERROR_LINE_RE = re.compile('|'.join(map(re.escape, _ERROR_LINE_KEYWORDS)))
+    _TERMINAL_PROMPTS = ('$', '>', 'PS', 'C:\\')
+    _TERMINAL_PROMPT_RE = re.compile('|'.join(map(re.escape, _TERMINAL_PROMPTS)))
+    _CREDENTIAL_KEYWORDS = ('password', 'api_key', 'secret', 'token')
+    _CODE_KEYWORDS = ('def ', 'function', 'class ')
+    _DIAGRAM_KEYWORDS = (
+        ('Architecture Diagram', ('database', 'db', 'server', 'api', 'client')),
+        ('Flowchart', ('start', 'end', 'decision', 'process')),
+        ('UML Class Diagram', ('class', 'interface', 'extends')),
+        ('Use Case Diagram', ('user', 'system', 'actor')),
+    )
+    
+    # Result type -> print method, for replaying cached results
+    _PRINTERS = {
+        'text_extraction': '_print_text_result',
+        'code_extraction': '_print_code_result',
+        'error_extraction': '_print_error_result',
+        'diagram_analysis': '_print_diagram_result',
+        'terminal_analysis': '_print_terminal_result',
+        'security_analysis': '_print_security_result',
+    }
+    
+    def __init__(self, ocr_timeout: float = 30.0, ocr_workers: Optional[int] = None):
+        """
+        Args:
+            ocr_timeout: Seconds before a tesseract run is abandoned (0 disables).
+                Applies to pytesseract; the tesserocr engine has no timeout hook.
+            ocr_workers: Processes for batch OCR (default: CPU count; 1 disables the pool)
+        """
+        self.ocr_timeout = ocr_timeout
+        self.ocr_workers = ocr_workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
         self.supported_formats = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.webp']
-        self.analysis_history = []
+        self.analysis_history: deque = deque(maxlen=self.HISTORY_SIZE)
+        self._tess = None
+        self._ready = False
+        self._result_cache: OrderedDict[Tuple[str, str], Dict] = OrderedDict()
         logger.info("SARKAAR Vision Module initialized")
+    
+    def close(self):
+        """Shut down the OCR process pool and release the tesserocr engine"""
+        pool, self._pool = getattr(self, '_pool', None), None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        tess, self._tess = getattr(self, '_tess', None), None
+        if tess is not None:
+            tess.End()
+    
+    def __del__(self):
+        self.close()
+    
+    def _ensure_ready(self, check_dependencies: bool = True):
+        """Load imaging libraries and check dependencies before the first analysis"""
+        if self._ready:
+            return
+        self._ready = True
+        _load_vision_libs()
+        self._tess = self._init_tesserocr()
+        if check_dependencies:
+            self._check_dependencies()
+    
+    def _init_tesserocr(self):
+        """Create the persistent tesserocr engine, or None to fall back to pytesseract"""
+        if not TESSEROCR_AVAILABLE:
+            return None
+        try:
+            return PyTessBaseAPI(lang='eng')
+        except RuntimeError as e:
+            logger.warning(f"tesserocr unavailable, using pytesseract: {e}")
+            return None
+    
+    def _preprocess_for_ocr(self, img: Image.Image) -> Image.Image:
+        """Grayscale, downscale and binarize an image so tesseract has fewer pixels to process"""
+        if not CV2_AVAILABLE:
+            return img
         
-        # Check dependencies
-        self._check_dependencies()
+        gray = np.asarray(img.convert('L'))
+        longest = max(gray.shape)
+        if longest > self.OCR_MAX_SIDE:
+            scale = self.OCR_MAX_SIDE / longest
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return Image.fromarray(bw)
+    
+    def _ocr(self, img: Image.Image, psm: Optional[int] = None) -> str:
+        """Run OCR on an image, optionally with a page segmentation mode"""
+        img = self._preprocess_for_ocr(img)
+        if self._tess is not None:
+            self._tess.SetPageSegMode(psm if psm is not None else PSM.AUTO)
+            self._tess.SetImage(img)
+            return self._tess.GetUTF8Text()
+        config = f'--oem 3 --psm {psm}' if psm is not None else ''
+        return pytesseract.image_to_string(img, config=config, timeout=self.ocr_timeout)
+    
+    def _ocr_tsv(self, img: Image.Image, psm: Optional[int] = None) -> str:
+        """Run OCR and return tesseract's TSV table: one row per word, with its confidence"""
+        img = self._preprocess_for_ocr(img)
+        if self._tess is not None:
+            self._tess.SetPageSegMode(psm if psm is not None else PSM.AUTO)
+            self._tess.SetImage(img)
+            return self._tess.GetTSVText(0)
+        config = f'--oem 3 --psm {psm}' if psm is not None else ''
+        return pytesseract.image_to_data(img, config=config, timeout=self.ocr_timeout)
+    
+    def _ocr_lines(self, img: Image.Image, psm: Optional[int] = None) -> List[str]:
+        """OCR an image into text lines, dropping words below MIN_WORD_CONFIDENCE"""
+        lines: Dict[Tuple[str, ...], List[str]] = {}
+        for row in self._ocr_tsv(img, psm).splitlines():
+            # level page block par line word left top width height conf text
+            cols = row.split('\t')
+            if len(cols) < 12 or not cols[11].strip():
+                continue
+            try:
+                conf = float(cols[10])
+            except ValueError:
+                continue  # Header row
+            if conf >= self.MIN_WORD_CONFIDENCE:
+                lines.setdefault(tuple(cols[1:5]), []).append(cols[11])
+        return [' '.join(words) for words in lines.values()]
     
     def _check_dependencies(self):
         """Check if required libraries are installed"""
@@ -65,10 +250,11 @@ class SARKAARVision:
         if not CV2_AVAILABLE:
             issues.append("OpenCV - Install: pip install opencv-python")
         
-        try:
-            pytesseract.get_tesseract_version()
-        except:
-            issues.append("Tesseract OCR - Install: https://github.com/UB-Mannheim/tesseract/wiki")
+        if self._tess is None:
+            try:
+                pytesseract.get_tesseract_version()
+            except:
+                issues.append("Tesseract OCR - Install: https://github.com/UB-Mannheim/tesseract/wiki")
         
         if issues:
             print("\n⚠️  Missing dependencies:")
@@ -87,36 +273,275 @@ class SARKAARVision:
         Returns:
             Dictionary with analysis results
         """
-        if not os.path.exists(image_path):
-            return {"error": f"Image not found: {image_path}"}
+        error = self._validate_image_path(image_path)
+        if error:
+            return {"error": error}
         
-        file_ext = Path(image_path).suffix.lower()
-        if file_ext not in self.supported_formats:
-            return {"error": f"Unsupported format: {file_ext}"}
+        try:
+            key = self._content_key(image_path, analysis_type)
+        except OSError as e:
+            return {"error": str(e)}
+        cached = self._cached_result(key, image_path)
+        if cached is not None:
+            return cached
         
+        self._ensure_ready()
         logger.info(f"Analyzing image: {image_path} (type: {analysis_type})")
+        result = self._analyze_path(image_path, analysis_type)
+        self._cache_result(key, result)
+        return result
+    
+    def analyze_images(self, image_paths: List[str], analysis_type: str = "auto") -> List[Dict]:
+        """
+        Analyze several images, running OCR for all of them up front
+        
+        Large batches are OCRed in the analyzer's process pool, smaller ones
+        as one tesseract run over a list file, so the batch doesn't pay a
+        process spawn and model load per image.
+        
+        Args:
+            image_paths: Paths to image files
+            analysis_type: Same values as analyze_image
+        
+        Returns:
+            One result dictionary per path, in input order
+        """
+        results: List[Optional[Dict]] = [None] * len(image_paths)
+        keys: Dict[int, Tuple[str, str]] = {}
+        valid = []
+        for i, image_path in enumerate(image_paths):
+            error = self._validate_image_path(image_path)
+            if error:
+                results[i] = {"error": error}
+                continue
+            try:
+                keys[i] = self._content_key(image_path, analysis_type)
+            except OSError as e:
+                results[i] = {"error": str(e)}
+                continue
+            results[i] = self._cached_result(keys[i], image_path)
+            if results[i] is None:
+                valid.append(i)
+        
+        self._ensure_ready()
+        logger.info(f"Analyzing {len(valid)} images (type: {analysis_type})")
+        texts = self._batch_ocr([image_paths[i] for i in valid], analysis_type)
+        
+        if not PIL_AVAILABLE:
+            for i in valid:
+                results[i] = {"error": "PIL not installed"}
+            return results
         
+        # Decode the next images while the current one is being analyzed;
+        # with OCR already done, the header (size, format) is usually enough
+        loaded = self._prefetch_images([image_paths[i] for i in valid], decode=texts is None)
+        with closing(loaded):
+            for n, (i, (img, error)) in enumerate(zip(valid, loaded)):
+                if error is not None:
+                    logger.error(f"Analysis failed: {str(error)}")
+                    results[i] = {"error": str(error)}
+                    continue
+                ocr_text = texts[n] if texts is not None else None
+                with img:  # Releases the file handle a lazy image keeps open
+                    results[i] = self._analyze_path(image_paths[i], analysis_type, ocr_text, img)
+                self._cache_result(keys[i], results[i])
+        return results
+    
+    def _record_history(self, result: Dict):
+        """Keep a light summary of a result; full OCR text and code are not retained"""
+        self.analysis_history.append({
+            'type': result.get('type'),
+            'metadata': result.get('metadata'),
+            'summary': result.get('suggestion') or result.get('insights') or ''
+        })
+    
+    def _content_key(self, image_path: str, analysis_type: str) -> Tuple[str, str]:
+        """Result cache key from the image bytes, so copies and renames still hit"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest(), analysis_type
+    
+    def _cached_result(self, key: Tuple[str, str], image_path: str) -> Optional[Dict]:
+        """Replay a cached analysis with fresh metadata, or None on a miss"""
+        cached = self._result_cache.get(key)
+        if cached is None:
+            return None
+        self._result_cache.move_to_end(key)
+        
+        logger.info(f"Reusing cached analysis: {image_path} (type: {key[1]})")
+        result = dict(cached)
+        result['metadata'] = {
+            **cached['metadata'],
+            'image_path': image_path,
+            'timestamp_ns': time.time_ns()
+        }
+        self._print_result(result)
+        self._record_history(result)
+        return result
+    
+    def _cache_result(self, key: Tuple[str, str], result: Dict):
+        """Remember a successful analysis, evicting the least recently used"""
+        if 'error' in result:
+            return
+        self._result_cache[key] = result
+        if len(self._result_cache) > self.RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+    
+    def _prefetch_images(self, image_paths: List[str],
+                         decode: bool = True) -> Iterator[Tuple[Optional[Image.Image], Optional[Exception]]]:
+        """
+        Open (and decode, unless `decode` is False) images on a background
+        thread, yielding (image, error) in order
+        
+        The caller closes each image it receives. Closing the generator
+        early stops the loader and closes images it had read ahead.
+        """
+        queue = Queue(maxsize=self.PREFETCH_DEPTH)
+        stop = Event()
+        
+        def put(item) -> bool:
+            """Queue an item for the consumer; False once it has stopped"""
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+        
+        def loader():
+            for image_path in image_paths:
+                img = None
+                try:
+                    img = Image.open(image_path)
+                    if decode:
+                        img.load()  # Otherwise pixels load lazily if analysis needs them
+                    item = (img, None)
+                except Exception as e:
+                    if img is not None:
+                        img.close()
+                    item = (None, e)
+                if not put(item):
+                    if img is not None:
+                        img.close()
+                    return
+        
+        thread = Thread(target=loader, name="vision-prefetch", daemon=True)
+        thread.start()
+        try:
+            for _ in image_paths:
+                yield queue.get()
+        finally:
+            stop.set()
+            thread.join()
+            while True:
+                try:
+                    img, _ = queue.get_nowait()
+                except Empty:
+                    break
+                if img is not None:
+                    img.close()
+    
+    def _batch_ocr(self, image_paths: List[str], analysis_type: str) -> Optional[List[str]]:
+        """OCR all images up front, or return None to OCR per image during analysis"""
+        if len(image_paths) < 2 or not PIL_AVAILABLE:
+            return None
+        
+        psm = self._PSM.get(analysis_type)
+        if self.ocr_workers > 1 and len(image_paths) >= self.PARALLEL_OCR_MIN_IMAGES:
+            return self._parallel_ocr(image_paths, psm)
+        
+        # The persistent engine has no per-call spawn cost to amortize
+        if self._tess is not None:
+            return None
+        return self._list_file_ocr(image_paths, psm)
+    
+    def _ocr_pool(self) -> ProcessPoolExecutor:
+        """The analyzer's OCR process pool, started on first use and kept until close()"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.ocr_workers, initializer=_init_ocr_worker
+            )
+        return self._pool
+    
+    def _parallel_ocr(self, image_paths: List[str], psm: Optional[int]) -> Optional[List[str]]:
+        """OCR images in a process pool, one single-threaded tesseract per core"""
+        try:
+            count = len(image_paths)
+            return list(self._ocr_pool().map(
+                _ocr_worker, image_paths, [psm] * count, [self.ocr_timeout] * count
+            ))
+        except Exception as e:
+            logger.warning(f"Parallel OCR failed, falling back to per-image OCR: {e}")
+            if isinstance(e, BrokenProcessPool):
+                self._pool = None  # Start a fresh pool next batch
+            return None
+    
+    def _list_file_ocr(self, image_paths: List[str], psm: Optional[int]) -> Optional[List[str]]:
+        """OCR images in one tesseract run over a list file"""
+        config = f'--oem 3 --psm {psm}' if psm is not None else ''
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                # Same preprocessing as per-image OCR, written out for tesseract
+                pages = [os.path.abspath(p) for p in image_paths]
+                if CV2_AVAILABLE:
+                    for n, image_path in enumerate(image_paths):
+                        with Image.open(image_path) as img:
+                            pages[n] = str(Path(tmp) / f"{n}.png")
+                            self._preprocess_for_ocr(img).save(pages[n])
+                list_path = Path(tmp) / "list.txt"
+                list_path.write_text("\n".join(pages) + "\n", encoding="utf-8")
+                combined = pytesseract.image_to_string(
+                    str(list_path), config=config, timeout=self.ocr_timeout * len(image_paths)
+                )
+        except Exception as e:
+            logger.warning(f"Batch OCR failed, falling back to per-image OCR: {e}")
+            return None
+        
+        # Tesseract ends every page with a form feed
+        texts = combined.split('\x0c')
+        if len(texts) < len(image_paths):
+            # Multi-page inputs (e.g. TIFF) break the one-page-per-image mapping
+            logger.warning("Batch OCR page count mismatch, falling back to per-image OCR")
+            return None
+        return texts[:len(image_paths)]
+    
+    def _validate_image_path(self, image_path: str) -> Optional[str]:
+        """Return an error message if the path can't be analyzed"""
+        if not os.path.exists(image_path):
+            return f"Image not found: {image_path}"
+        
+        file_ext = Path(image_path).suffix.lower()
+        if file_ext not in self.supported_formats:
+            return f"Unsupported format: {file_ext}"
+        return None
+    
+    def _analyze_path(self, image_path: str, analysis_type: str, ocr_text: Optional[str] = None,
+                      img: Optional[Image.Image] = None) -> Dict:
+        """Load a validated image (unless already loaded) and run the requested analysis"""
         try:
             # Load image
             if PIL_AVAILABLE:
-                img = Image.open(image_path)
-                img_array = np.array(img) if CV2_AVAILABLE else None
+                if img is None:
+                    img = Image.open(image_path)
             else:
                 return {"error": "PIL not installed"}
             
             # Perform analysis based on type
             if analysis_type == "auto":
-                result = self._auto_detect_and_analyze(img, img_array, image_path)
+                result = self._auto_detect_and_analyze(img, image_path, ocr_text)
             elif analysis_type == "ocr":
-                result = self._extract_text(img)
+                result = self._extract_text(img, ocr_text)
             elif analysis_type == "code":
-                result = self._extract_code(img)
+                result = self._extract_code(img, ocr_text)
             elif analysis_type == "diagram":
-                result = self._analyze_diagram(img, img_array)
+                result = self._analyze_diagram(img, ocr_text)
             elif analysis_type == "security":
-                result = self._security_analysis(img, img_array)
+                result = self._security_analysis(img, ocr_text)
             elif analysis_type == "error":
-                result = self._extract_error_message(img)
+                result = self._extract_error_message(img, ocr_text)
             else:
                 result = {"error": f"Unknown analysis type: {analysis_type}"}
             
@@ -125,58 +550,58 @@ class SARKAARVision:
                 'image_path': image_path,
                 'image_size': img.size,
                 'analysis_type': analysis_type,
-                'timestamp': datetime.now().isoformat()
+                'timestamp_ns': time.time_ns()
             }
             
-            self.analysis_history.append(result)
+            self._record_history(result)
             return result
         
         except Exception as e:
             logger.error(f"Analysis failed: {str(e)}")
             return {"error": str(e)}
     
-    def _auto_detect_and_analyze(self, img: Image.Image, img_array, path: str) -> Dict:
+    def _auto_detect_and_analyze(self, img: Image.Image, path: str,
+                                 ocr_text: Optional[str] = None) -> Dict:
         """Automatically detect content type and analyze"""
         logger.info("Auto-detecting image content type...")
         
         # Extract all text first
-        text = self._extract_text_raw(img)
+        text = ocr_text if ocr_text is not None else self._extract_text_raw(img)
         
-        # Detect content type
-        content_type = self._detect_content_type(text, img)
+        # Detect content type; the lowercased text is shared with the diagram detector
+        text_lower = text.lower()
+        content_type = self._detect_content_type(text, img, text_lower)
         
         print(f"\n🔍 Detected content type: {content_type.upper()}\n")
         
+        # Reuse the detection OCR pass; only code gets its own PSM 6 pass,
+        # since block segmentation keeps line layout that auto mode loses
         if content_type == "code":
             return self._extract_code(img)
         elif content_type == "error":
-            return self._extract_error_message(img)
+            return self._extract_error_message(img, ocr_text=text)
         elif content_type == "diagram":
-            return self._analyze_diagram(img, img_array)
+            return self._analyze_diagram(img, ocr_text=text, ocr_lower=text_lower)
         elif content_type == "terminal":
-            return self._analyze_terminal(img)
+            return self._analyze_terminal(img, ocr_text=text)
         else:
-            return self._extract_text(img)
+            return self._extract_text(img, ocr_text=text)
     
-    def _detect_content_type(self, text: str, img: Image.Image) -> str:
-        """Detect what type of content the image contains"""
-        text_lower = text.lower()
+    def _detect_content_type(self, text: str, img: Image.Image, text_lower: Optional[str] = None) -> str:
+        """Detect what type of content the image contains, checking categories in priority order"""
+        if text_lower is None:
+            text_lower = text.lower()
         
         # Check for code indicators
-        code_indicators = ['def ', 'class ', 'function', 'import ', 'const ', 'var ', 
-                          'public ', 'private ', '{', '}', 'if(', 'for(', '<?php']
-        if any(indicator in text_lower for indicator in code_indicators):
+        if any(indicator in text_lower for indicator in self._CODE_INDICATORS):
             return "code"
         
         # Check for error indicators
-        error_indicators = ['error', 'exception', 'traceback', 'failed', 'warning',
-                           'at line', 'syntax error', 'undefined']
-        if any(indicator in text_lower for indicator in error_indicators):
+        if any(indicator in text_lower for indicator in self._ERROR_INDICATORS):
             return "error"
         
         # Check for terminal/command prompt
-        terminal_indicators = ['c:\\', 'ps ', '$ ', '~/', 'root@', 'admin@']
-        if any(indicator in text_lower for indicator in terminal_indicators):
+        if any(indicator in text_lower for indicator in self._TERMINAL_INDICATORS):
             return "terminal"
         
         # Check for diagram (fewer text, more shapes)
@@ -185,10 +610,10 @@ class SARKAARVision:
         
         return "text"
     
-    def _extract_text(self, img: Image.Image) -> Dict:
+    def _extract_text(self, img: Image.Image, ocr_text: Optional[str] = None) -> Dict:
         """Extract all text using OCR"""
         try:
-            text = pytesseract.image_to_string(img)
+            text = ocr_text if ocr_text is not None else self._ocr(img)
             
             result = {
                 'type': 'text_extraction',
@@ -207,16 +632,18 @@ class SARKAARVision:
     def _extract_text_raw(self, img: Image.Image) -> str:
         """Extract text without formatting"""
         try:
-            return pytesseract.image_to_string(img)
+            return self._ocr(img)
+        except RuntimeError:
+            # pytesseract's timeout; retrying in another handler would stall again
+            raise
         except:
             return ""
     
-    def _extract_code(self, img: Image.Image) -> Dict:
+    def _extract_code(self, img: Image.Image, ocr_text: Optional[str] = None) -> Dict:
         """Extract and analyze code from image"""
         try:
-            # Extract text with better code detection
-            custom_config = r'--oem 3 --psm 6'
-            code_text = pytesseract.image_to_string(img, config=custom_config)
+            # Extract text with better code detection (single uniform block)
+            code_text = ocr_text if ocr_text is not None else self._ocr(img, psm=self._PSM['code'])
             
             # Detect programming language
             language = self._detect_language(code_text)
@@ -243,7 +670,7 @@ class SARKAARVision:
     
     def _detect_language(self, code: str) -> str:
         """Detect programming language"""
-        code_lower = code.lower()
+        code_upper = code.upper()
         
         if 'def ' in code and 'import ' in code:
             return 'Python'
@@ -255,7 +682,7 @@ class SARKAARVision:
             return 'C/C++'
         elif '<?php' in code:
             return 'PHP'
-        elif 'SELECT' in code.upper() or 'INSERT' in code.upper():
+        elif 'SELECT' in code_upper or 'INSERT' in code_upper:
             return 'SQL'
         elif 'echo' in code or 'ls' in code or 'cd ' in code:
             return 'Bash/Shell'
@@ -264,18 +691,13 @@ class SARKAARVision:
     
     def _clean_code_text(self, text: str) -> str:
         """Clean OCR artifacts from code"""
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            # Remove empty lines
-            if line.strip():
-                # Fix common OCR mistakes
-                line = line.replace('|', 'I')
-                line = line.replace('O', '0') if any(c.isdigit() for c in line) else line
-                cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
+        # Fix common OCR mistakes: '|' read for 'I', and 'O' for '0' on
+        # lines that contain digits. Empty lines are dropped.
+        return '\n'.join(
+            line if _DIGITS.isdisjoint(line) else line.replace('O', '0')
+            for line in text.translate(_PIPE_TO_I).split('\n')
+            if line.strip()
+        )
     
     def _analyze_code(self, code: str, language: str) -> Dict:
         """Analyze extracted code"""
@@ -299,22 +721,21 @@ class SARKAARVision:
         
         return " | ".join(suggestions) if suggestions else "Code looks good"
     
-    def _extract_error_message(self, img: Image.Image) -> Dict:
+    def _extract_error_message(self, img: Image.Image, ocr_text: Optional[str] = None) -> Dict:
         """Extract and analyze error messages"""
         try:
-            text = pytesseract.image_to_string(img)
+            # Low-confidence words are mostly noise that trips the keyword scan
+            text = ocr_text if ocr_text is not None else '\n'.join(self._ocr_lines(img, psm=self._PSM['error']))
             
             # Find error patterns
-            errors = []
-            lines = text.split('\n')
-            
-            for i, line in enumerate(lines):
-                if any(keyword in line.lower() for keyword in ['error', 'exception', 'failed', 'traceback']):
-                    errors.append({
-                        'line': i + 1,
-                        'message': line.strip(),
-                        'type': self._classify_error(line)
-                    })
+            errors = [
+                {
+                    'line': line_no,
+                    'message': line.strip(),
+                    'type': self._classify_error(line)
+                }
+                for line_no, line in self._error_lines(text)
+            ]
             
             result = {
                 'type': 'error_extraction',
@@ -330,6 +751,29 @@ class SARKAARVision:
         except Exception as e:
             return {"error": f"Error extraction failed: {str(e)}"}
     
+    def _error_lines(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (line number, line) for each line containing an error keyword"""
+        text_lower = text.lower()
+        if len(text_lower) != len(text):
+            # A few case mappings change length, so offsets wouldn't line up
+            for line_no, line in enumerate(text.split('\n'), 1):
+                if self._ERROR_LINE_RE.search(line.lower()):
+                    yield line_no, line
+            return
+        
+        # One scan over the whole text, expanding each hit to its line
+        line_no, pos, end = 1, 0, -1
+        for match in self._ERROR_LINE_RE.finditer(text_lower):
+            if match.start() < end:
+                continue  # Line already reported
+            start = text.rfind('\n', 0, match.start()) + 1
+            end = text.find('\n', match.end())
+            if end < 0:
+                end = len(text)
+            line_no += text.count('\n', pos, start)
+            pos = start
+            yield line_no, text[start:end]
+    
     def _classify_error(self, error_line: str) -> str:
         """Classify error type"""
         error_lower = error_line.lower()
@@ -367,13 +811,14 @@ class SARKAARVision:
         
         return solutions[:3]  # Top 3 solutions
     
-    def _analyze_diagram(self, img: Image.Image, img_array) -> Dict:
+    def _analyze_diagram(self, img: Image.Image, ocr_text: Optional[str] = None,
+                         ocr_lower: Optional[str] = None) -> Dict:
         """Analyze architecture diagrams and flowcharts"""
         try:
-            text = pytesseract.image_to_string(img)
+            text = ocr_text if ocr_text is not None else self._ocr(img, psm=self._PSM['diagram'])
             
             # Detect diagram type
-            diagram_type = self._detect_diagram_type(text, img)
+            diagram_type = self._detect_diagram_type(text, img, ocr_lower if ocr_text is not None else None)
             
             # Extract components
             components = self._extract_diagram_components(text)
@@ -392,20 +837,15 @@ class SARKAARVision:
         except Exception as e:
             return {"error": f"Diagram analysis failed: {str(e)}"}
     
-    def _detect_diagram_type(self, text: str, img: Image.Image) -> str:
+    def _detect_diagram_type(self, text: str, img: Image.Image, text_lower: Optional[str] = None) -> str:
         """Detect type of diagram"""
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         
-        if any(word in text_lower for word in ['database', 'db', 'server', 'api', 'client']):
-            return 'Architecture Diagram'
-        elif any(word in text_lower for word in ['start', 'end', 'decision', 'process']):
-            return 'Flowchart'
-        elif any(word in text_lower for word in ['class', 'interface', 'extends']):
-            return 'UML Class Diagram'
-        elif any(word in text_lower for word in ['user', 'system', 'actor']):
-            return 'Use Case Diagram'
-        else:
-            return 'General Diagram'
+        for diagram_type, words in self._DIAGRAM_KEYWORDS:
+            if any(word in text_lower for word in words):
+                return diagram_type
+        return 'General Diagram'
     
     def _extract_diagram_components(self, text: str) -> List[str]:
         """Extract key components from diagram"""
@@ -428,17 +868,17 @@ class SARKAARVision:
         else:
             return f"Diagram contains {len(components)} elements."
     
-    def _analyze_terminal(self, img: Image.Image) -> Dict:
+    def _analyze_terminal(self, img: Image.Image, ocr_text: Optional[str] = None) -> Dict:
         """Analyze terminal/command prompt screenshots"""
         try:
-            text = pytesseract.image_to_string(img)
+            text = ocr_text if ocr_text is not None else self._ocr(img, psm=self._PSM['terminal'])
             
             commands = []
             outputs = []
             
-            lines = text.split('\n')
-            for line in lines:
-                if any(prompt in line for prompt in ['$', '>', 'PS', 'C:\\']):
+            is_prompt = self._TERMINAL_PROMPT_RE.search
+            for line in text.split('\n'):
+                if is_prompt(line):
                     commands.append(line.strip())
                 else:
                     outputs.append(line.strip())
@@ -472,15 +912,16 @@ class SARKAARVision:
         
         return suggestions
     
-    def _security_analysis(self, img: Image.Image, img_array) -> Dict:
+    def _security_analysis(self, img: Image.Image, ocr_text: Optional[str] = None) -> Dict:
         """Security-focused image analysis"""
         try:
-            text = pytesseract.image_to_string(img)
+            text = ocr_text if ocr_text is not None else self._ocr(img, psm=self._PSM['security'])
             
             vulnerabilities = []
             
             # Check for exposed credentials
-            if any(keyword in text.lower() for keyword in ['password', 'api_key', 'secret', 'token']):
+            text_lower = text.lower()
+            if any(keyword in text_lower for keyword in self._CREDENTIAL_KEYWORDS):
                 vulnerabilities.append({
                     'severity': 'HIGH',
                     'type': 'Exposed Credentials',
@@ -523,13 +964,23 @@ class SARKAARVision:
     def _analyze_extracted_text(self, text: str) -> Dict:
         """Analyze extracted text content"""
         return {
-            'contains_code': any(keyword in text for keyword in ['def ', 'function', 'class ']),
+            'contains_code': any(keyword in text for keyword in self._CODE_KEYWORDS),
             'contains_urls': 'http' in text.lower(),
             'contains_emails': '@' in text and '.' in text,
             'language_detected': 'English'  # Simple detection
         }
     
+    @staticmethod
+    def _fmt_ts(timestamp_ns: int) -> str:
+        """Format a metadata timestamp_ns for display"""
+        return datetime.fromtimestamp(timestamp_ns / 1e9).isoformat()
+    
     # Print methods for better visualization
+    def _print_result(self, result: Dict):
+        printer = self._PRINTERS.get(result.get('type'))
+        if printer:
+            getattr(self, printer)(result)
+    
     def _print_text_result(self, result: Dict):
         print(f"{'='*70}")
         print("TEXT EXTRACTION RESULTS")
@@ -595,6 +1046,24 @@ class SARKAARVision:
         print(f"{'='*70}\n")
 
 
+# Per-process engine for _ocr_worker, created on the worker's first task
+_worker_vision: Optional[SARKAARVision] = None
+
+
+def _init_ocr_worker():
+    """Pool initializer: one OpenMP thread per tesseract, since the pool already uses every core"""
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def _ocr_worker(image_path: str, psm: Optional[int], ocr_timeout: float) -> str:
+    """OCR one image inside a ProcessPoolExecutor worker"""
+    global _worker_vision
+    if _worker_vision is None:
+        _worker_vision = SARKAARVision(ocr_timeout)
+        _worker_vision._ensure_ready(check_dependencies=False)
+    return _worker_vision._ocr(Image.open(image_path), psm)
+
+
 def main():
     """Interactive vision module interface"""
     vision = SARKAARVision()
@@ -652,11 +1121,15 @@ def main():
         
         elif choice == '7':
             print(f"\n📊 Analysis History: {len(vision.analysis_history)} items")
-            for i, analysis in enumerate(vision.analysis_history[-5:], 1):
-                print(f"{i}. {analysis.get('type', 'unknown')} - {analysis.get('metadata', {}).get('timestamp', 'N/A')}")
+            history = vision.analysis_history
+            for i, analysis in enumerate(islice(history, max(len(history) - 5, 0), None), 1):
+                timestamp_ns = analysis.get('metadata', {}).get('timestamp_ns')
+                timestamp = SARKAARVision._fmt_ts(timestamp_ns) if timestamp_ns else 'N/A'
+                print(f"{i}. {analysis.get('type', 'unknown')} - {timestamp}")
         
         elif choice == '8':
             print("\n👋 Vision module shutting down!")
+            vision.close()
             break
         
         else:
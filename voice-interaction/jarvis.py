@@ -1,41 +1,354 @@
+import asyncio
 import speech_recognition as sr
 import pyttsx3
 import datetime
 import webbrowser
+import io
 import os
-import time
 import re
-from openai import OpenAI
+import hashlib
+import queue
+import subprocess
+import wave
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from enum import Enum
+from pathlib import Path
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# Optional: Cloud Speech v2 streams audio while the user talks instead of
+# uploading the whole clip after end-of-speech (needs GOOGLE_CLOUD_PROJECT)
+try:
+    from google.api_core.exceptions import GoogleAPICallError
+    from google.cloud.speech_v2 import SpeechClient
+    from google.cloud.speech_v2.types import cloud_speech
+    CLOUD_SPEECH_AVAILABLE = True
+except ImportError:
+    CLOUD_SPEECH_AVAILABLE = False
+
+# Optional: Azure neural TTS over a persistent connection, so sentences
+# are queued for synthesis without blocking (needs SPEECH_KEY/SPEECH_REGION)
+try:
+    import azure.cognitiveservices.speech as speechsdk
+    AZURE_TTS_AVAILABLE = True
+except ImportError:
+    AZURE_TTS_AVAILABLE = False
+
+# Optional: Silero VAD (ONNX) for endpointing instead of the energy
+# threshold; used when silero_vad.onnx is present (or SILERO_VAD_MODEL)
+try:
+    import numpy as np
+    import onnxruntime as ort
+    VAD_AVAILABLE = True
+except ImportError:
+    VAD_AVAILABLE = False
+
+# Optional: on-device models, so neither transcription nor speech waits
+# on the network (faster-whisper for STT; piper for TTS, needs PIPER_VOICE)
+try:
+    import numpy as np
+    from faster_whisper import WhisperModel
+    WHISPER_AVAILABLE = True
+except ImportError:
+    WHISPER_AVAILABLE = False
+
+try:
+    from piper import PiperVoice
+    PIPER_AVAILABLE = True
+except ImportError:
+    PIPER_AVAILABLE = False
+
+# Optional: libuv event loop, cheaper per await than asyncio's default
+# (not built for Windows, where the standard loop is used)
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# Optional: exact token counts for the history budget (otherwise ~4 chars/token)
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Cached phrases are replayed from memory as WAV (Windows only)
+try:
+    import winsound
+    WAV_PLAYBACK_AVAILABLE = True
+except ImportError:
+    WAV_PLAYBACK_AVAILABLE = False
+
+
+# A sentence is complete once its terminator (with any closing quote or
+# bracket) is followed by whitespace, so decimals and domains in the middle
+# of a token stream don't split it. Titles, e.g./i.e. and list numbers
+# don't end one; a line break always does, since list items often have
+# no terminator.
+SENTENCE_END = re.compile(
+    r"(?<!\bMr)(?<!\bMrs)(?<!\bMs)(?<!\bDr)(?<!\bSt)(?<!\be\.g)(?<!\bi\.e)"
+    r"(?<!^\d)(?<!^\d\d)[.!?]+[\"')\]]*(?=\s)|\n",
+    re.MULTILINE,
+)
+
+# Markdown characters the voice would otherwise read out
+SPEECH_MARKUP = re.compile(r"[`*_#]")
+
+# First link in an AI reply, opened in the browser
+URL = re.compile(r"https?://\S+")
+
+# Small talk the fast model answers as well as the smart one
+CHIT_CHAT = re.compile(
+    r"^(?:hi|hello|hey|thanks|thank you|good (?:morning|afternoon|evening|night)"
+    r"|how are you|who are you|what(?:'s| is) your name|tell me a joke)\b"
+)
+
+# Utterances that are nothing but a command execute_command carries out
+# by itself; these skip the LLM (questions that mention one don't)
+COMMAND_INTENT = re.compile(
+    r"^(?:open (?:notepad|calculator|command prompt|cmd)\b"
+    r"|search for \S|(?:show )?images of \S)"
+)
+
+# Microphone format: 16 kHz mono, read in 96 ms chunks (three VAD frames)
+MIC_SAMPLE_RATE = 16000
+MIC_CHUNK = 1536
+
+# Silero VAD: 32 ms frames; speech starts after 96 ms above the threshold
+# and ends after ~200 ms below it. Audio just before the start is kept
+# so the first syllable isn't clipped.
+VAD_MODEL = Path(
+    os.environ.get("SILERO_VAD_MODEL", Path(__file__).with_name("silero_vad.onnx"))
+)
+VAD_FRAME = 512
+VAD_THRESHOLD = 0.5
+VAD_START_FRAMES = 3
+VAD_END_FRAMES = 7
+VAD_PREROLL_FRAMES = 10
+
+# Longest a streaming listen waits for a final transcript
+# (the batch path's 5 s start timeout plus its 15 s phrase limit)
+STREAM_LISTEN_SECONDS = 20
+
+# How long a partial transcript must stay unchanged before the LLM
+# request is started on it speculatively
+PREFETCH_STABLE_SECONDS = 0.3
+
+# Ambient noise is measured once at startup; afterwards the recognizer's
+# dynamic threshold tracks it, with a fresh measurement at most this
+# often, taken only while the microphone sits idle
+RECALIBRATE_SECONDS = 30
+
+# On-device models: Whisper size (int8 on CPU is plenty for commands)
+# and the piper voice file (.onnx with its .onnx.json beside it)
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "tiny.en")
+PIPER_VOICE = os.environ.get("PIPER_VOICE")
+
+# Two-tier LLM routing: short or chit-chat turns go to the fast model,
+# everything else to the smart one. Setting OLLAMA_MODEL serves the fast
+# tier from a local Ollama (same OpenAI API) instead.
+SMART_MODEL = "gpt-4.1-mini"
+FAST_MODEL = os.environ.get("JARVIS_FAST_MODEL", "gpt-4o-mini")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL")
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/v1")
+FAST_MAX_TOKENS = 8
+
+# OpenAI connections: a few kept alive for two minutes, and touched every
+# minute while idle so the next turn doesn't pay for a TCP/TLS handshake
+OPENAI_KEEPALIVE = httpx.Limits(max_keepalive_connections=4, keepalive_expiry=120)
+KEEP_WARM_SECONDS = 60
+
+# Conversation memory is bounded by tokens, not turns. Past the budget,
+# the oldest messages are condensed into one short summary in the background.
+HISTORY_TOKEN_BUDGET = 1500
+SUMMARY_MESSAGES = 6
+SUMMARY_MAX_TOKENS = 150
+
+# Barge-in: keep the mic open while JARVIS talks and stop speaking as soon
+# as the VAD hears the user. Opt-in, since without echo cancellation (a
+# headset, or the OS's communications AEC) JARVIS would interrupt itself.
+BARGE_IN = os.environ.get("JARVIS_BARGE_IN") == "1"
+
+# Speech waiting for the TTS thread; kept short so a long reply holds
+# back its producer instead of piling up audio that may be interrupted
+TTS_QUEUE_SIZE = 4
+
+# Azure voice used when cloud TTS is configured (British male, JARVIS-like)
+AZURE_VOICE = os.environ.get("AZURE_SPEECH_VOICE", "en-GB-RyanNeural")
+
+# Synthesized audio for speak() phrases: an in-memory LRU of WAV bytes
+# backed by one file per phrase, so fixed lines are never synthesized twice
+TTS_CACHE_SIZE = 256
+TTS_CACHE_DIR = Path(
+    os.environ.get("JARVIS_TTS_CACHE", Path.home() / ".jarvis" / "tts_cache")
+)
+
+# Fixed lines JARVIS says through speak(), plus the acknowledgements the
+# system prompt asks the LLM to open with; rendered ahead at startup
+CANNED_PHRASES = (
+    "Certainly, Sir.",
+    "Good day, Sir. JARVIS is online and ready.",
+    "I did not catch that, Sir. Please repeat.",
+    "Speech service is unavailable, Sir.",
+    "It has been a pleasure serving you, Sir.",
+    "Right away, Sir.",
+    "Shutting down. Until next time, Sir.",
+)
+
+
+class SileroVAD:
+    """Silero VAD v5 over 16 kHz int16 PCM, tracking speech start and end"""
+
+    CONTEXT = 64  # Samples of the previous frame the model expects in front
+
+    def __init__(self, model_path: Path):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._sr = np.array(MIC_SAMPLE_RATE, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        """Forget the previous utterance"""
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._context = np.zeros((1, self.CONTEXT), dtype=np.float32)
+        self.in_speech = False
+        self._voiced = 0
+        self._silent = 0
+
+    def _probability(self, frame: bytes) -> float:
+        x = np.frombuffer(frame, dtype=np.int16).astype(np.float32) / 32768.0
+        x = np.concatenate((self._context, x[np.newaxis, :]), axis=1)
+        out, self._state = self.session.run(
+            None, {"input": x, "state": self._state, "sr": self._sr}
+        )
+        self._context = x[:, -self.CONTEXT:]
+        return float(out[0][0])
+
+    def push(self, pcm: bytes) -> bool:
+        """Feed whole VAD frames; True once speech has started and then ended"""
+        step = VAD_FRAME * 2
+        for i in range(0, len(pcm) - step + 1, step):
+            speech = self._probability(pcm[i:i + step]) >= VAD_THRESHOLD
+            if not self.in_speech:
+                self._voiced = self._voiced + 1 if speech else 0
+                self.in_speech = self._voiced >= VAD_START_FRAMES
+            else:
+                self._silent = 0 if speech else self._silent + 1
+                if self._silent >= VAD_END_FRAMES:
+                    return True
+        return False
+
+
+class PipelineState(Enum):
+    """What the assistant is doing, in turn order"""
+    IDLE = "idle"
+    LISTENING = "listening"
+    TRANSCRIBING = "transcribing"
+    THINKING = "thinking"
+    SPEAKING = "speaking"
 
 
 class JarvisAssistant:
-    def __init__(self):
-        """Initialize JARVIS-style AI assistant (OpenAI-powered)"""
+    def __init__(self, on_state_change=None):
+        """Initialize JARVIS-style AI assistant (OpenAI-powered)
+
+        on_state_change, if given, is called with each new PipelineState
+        (from whichever thread made the change), e.g. to drive a UI.
+        """
+
+        # ===============================
+        # Pipeline State
+        # ===============================
+        # Stages run on different threads (mic, event loop, TTS), so
+        # transitions are serialized; stage_seconds keeps how long each
+        # state lasted the last time it was left
+        self.state = PipelineState.IDLE
+        self.stage_seconds = {}
+        self.on_state_change = on_state_change
+        self._state_lock = threading.Lock()
+        self._state_since = time.monotonic()
+        self._replying = False  # An LLM reply is still being generated
 
         # ===============================
         # Speech Recognition
         # ===============================
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.microphone = sr.Microphone(
+            sample_rate=MIC_SAMPLE_RATE, chunk_size=MIC_CHUNK
+        )
+        self._init_streaming_stt()
+        self.vad = None
+        if VAD_AVAILABLE and VAD_MODEL.exists():
+            self.vad = SileroVAD(VAD_MODEL)
+        if self.speech_client is None:
+            self._calibrate(duration=1.0)
+        self.whisper = None
+        if WHISPER_AVAILABLE:
+            self.whisper = WhisperModel(
+                WHISPER_MODEL, device="cpu", compute_type="int8"
+            )
 
         # ===============================
         # Text-to-Speech (JARVIS voice)
         # ===============================
-        self.engine = pyttsx3.init()
-        voices = self.engine.getProperty("voices")
-        self.engine.setProperty("voice", voices[0].id)  # male voice
-        self.engine.setProperty("rate", 175)
-        self.engine.setProperty("volume", 1.0)
+        # The engine lives on its own thread (SAPI5 is thread-affine) fed by
+        # a queue, so speech plays while the rest of the turn carries on
+        self._tts_q = queue.Queue(maxsize=TTS_QUEUE_SIZE)
+        self.synthesizer = None
+        self.piper = None
+        if PIPER_AVAILABLE and WAV_PLAYBACK_AVAILABLE and PIPER_VOICE:
+            self.piper = PiperVoice.load(PIPER_VOICE)
+            self._voice_hash = f"piper|{Path(PIPER_VOICE).name}".encode()
+        else:
+            self._init_cloud_tts()
+        self.engine = None
+        started = Future()
+        self._tts_thread = threading.Thread(
+            target=self._tts_worker, args=(started,),
+            name="jarvis-tts", daemon=True,
+        )
+        self._tts_thread.start()
+        started.result()  # Re-raises engine start-up errors here
 
         # ===============================
         # OpenAI Client (NO API KEY HERE)
         # ===============================
-        self.client = OpenAI()
+        self.client = AsyncOpenAI(http_client=self._openai_http_client())
+        self.llm_smart = (self.client, SMART_MODEL)
+        self.llm_fast = (self.client, FAST_MODEL)
+        if OLLAMA_MODEL:
+            self.llm_fast = (
+                AsyncOpenAI(base_url=OLLAMA_URL, api_key="ollama"), OLLAMA_MODEL
+            )
+
+        # Reply speculatively started from a stable partial transcript:
+        # (normalized text, generation task, delta queue)
+        self._prefetch = None
+        self._loop = None
+        # Set on shutdown; the listen thread checks it between mic reads
+        self._stop_listening = threading.Event()
 
         # ===============================
         # Conversation Memory
         # ===============================
         self.conversation_history = []
+        self._history_tokens = []  # Token count of each history message
+        self._summary_task = None  # Running _summarize_history, if any
+        self._encoding = None
+        if TIKTOKEN_AVAILABLE:
+            try:
+                self._encoding = tiktoken.encoding_for_model(SMART_MODEL)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("o200k_base")
 
         # ===============================
         # JARVIS Personality
@@ -53,31 +366,430 @@ class JarvisAssistant:
 
     # =====================================================
 
-    def speak(self, text: str):
-        """Convert text to speech"""
-        print(f"\n🤖 JARVIS: {text}\n")
-        clean = re.sub(r"[`*_#]", "", text)
+    def _init_engine(self):
+        """Create and configure the TTS engine (runs on the TTS thread)"""
+        engine = pyttsx3.init()
+        voices = engine.getProperty("voices")
+        self._voice_id = voices[0].id  # Looked up once; male voice
+        engine.setProperty("voice", self._voice_id)
+        engine.setProperty("rate", 175)
+        engine.setProperty("volume", 1.0)
+        self._voice_hash = f"{self._voice_id}|175".encode()
+        return engine
+
+    def _init_cloud_tts(self):
+        """Open the Azure synthesizer and its connection once; pyttsx3 is used without it"""
+        self.synthesizer = None
+        key = os.environ.get("SPEECH_KEY")
+        region = os.environ.get("SPEECH_REGION")
+        if not AZURE_TTS_AVAILABLE or not key or not region:
+            return
+
+        config = speechsdk.SpeechConfig(subscription=key, region=region)
+        config.speech_synthesis_voice_name = AZURE_VOICE
+        config.set_speech_synthesis_output_format(
+            speechsdk.SpeechSynthesisOutputFormat.Riff24Khz16BitMonoPcm
+        )
+        self._voice_hash = f"azure|{AZURE_VOICE}".encode()
+        self.synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=config,
+            audio_config=speechsdk.audio.AudioOutputConfig(use_default_speaker=True),
+        )
+        # Renders audio to bytes without playing it, for the phrase cache
+        self._tts_renderer = speechsdk.SpeechSynthesizer(
+            speech_config=config, audio_config=None
+        )
+        # Connect now so the first sentence doesn't pay for the handshake;
+        # the same connection is reused for every request afterwards
+        self._tts_connection = speechsdk.Connection.from_speech_synthesizer(
+            self.synthesizer
+        )
+        self._tts_connection.open(True)
+
+    def _speak_sentence(self, text: str):
+        """Send text to the Azure synthesizer and return its pending result at once"""
+        clean = SPEECH_MARKUP.sub("", text)
+        return self.synthesizer.speak_text_async(clean)
+
+    def _finish_speech(self, pending):
+        """Wait until a queued Azure sentence has been spoken"""
+        result = pending.get()
+        if result.reason == speechsdk.ResultReason.Canceled:
+            details = result.cancellation_details
+            print(f"❌ TTS error: {details.reason} {details.error_details or ''}")
+
+    def _set_state(self, state: PipelineState, only_from: PipelineState = None):
+        """Move to state (optionally only when currently in only_from)"""
+        with self._state_lock:
+            if state is self.state or (only_from is not None and self.state is not only_from):
+                return
+            now = time.monotonic()
+            self.stage_seconds[self.state] = now - self._state_since
+            self.state, self._state_since = state, now
+        if self.on_state_change is not None:
+            self.on_state_change(state)
+
+    def _tts_worker(self, started: Future):
+        """TTS thread: start the engine, then play queued speech in order"""
+        try:
+            if self.synthesizer is None and self.piper is None:
+                self.engine = self._init_engine()
+            self._init_tts_cache()
+        except Exception as e:
+            started.set_exception(e)
+            return
+        started.set_result(None)
+
+        # Items are (function, *args); None stops the thread
+        while (item := self._tts_q.get()) is not None:
+            func, *args = item
+            self._set_state(PipelineState.SPEAKING)
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"❌ TTS error: {e}")
+            finally:
+                self._tts_q.task_done()
+                if not self.is_speaking():
+                    # Caught up with a reply still streaming: back to thinking
+                    self._set_state(
+                        PipelineState.THINKING if self._replying else PipelineState.IDLE,
+                        only_from=PipelineState.SPEAKING,
+                    )
+        self._tts_q.task_done()
+
+    def _init_tts_cache(self):
+        """Create the phrase cache and render the canned phrases into it"""
+        self._tts_cache = None
+        if not WAV_PLAYBACK_AVAILABLE:
+            return
+        try:
+            TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"⚠️ TTS cache disabled: {e}")
+            return
+
+        self._tts_cache = OrderedDict()
+        for phrase in CANNED_PHRASES:
+            self._cached_audio(phrase)
+
+    def _piper_wav(self, clean: str) -> bytes:
+        """Synthesize clean text with the local piper voice into WAV bytes"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            self.piper.synthesize_wav(clean, wav)
+        return buffer.getvalue()
+
+    def _render_audio(self, clean: str, path: Path):
+        """Synthesize clean text into a WAV file without playing it"""
+        tmp = path.with_suffix(".tmp")
+        if self.piper is not None:
+            tmp.write_bytes(self._piper_wav(clean))
+        elif self.synthesizer is not None:
+            result = self._tts_renderer.speak_text_async(clean).get()
+            if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+                raise RuntimeError(f"synthesis failed ({result.reason})")
+            tmp.write_bytes(result.audio_data)
+        else:
+            self.engine.save_to_file(clean, str(tmp))
+            self.engine.runAndWait()
+        # Rename into place so a crash never leaves half a WAV in the cache
+        os.replace(tmp, path)
+
+    def _cached_audio(self, clean: str) -> bytes:
+        """WAV bytes for clean text, from memory, disk, or a fresh render"""
+        key = hashlib.blake2b(
+            clean.encode() + self._voice_hash, digest_size=16
+        ).hexdigest()
+        audio = self._tts_cache.get(key)
+        if audio is not None:
+            self._tts_cache.move_to_end(key)
+            return audio
+
+        path = TTS_CACHE_DIR / f"{key}.wav"
+        if not path.exists():
+            self._render_audio(clean, path)
+        audio = path.read_bytes()
+        self._tts_cache[key] = audio
+        if len(self._tts_cache) > TTS_CACHE_SIZE:
+            self._tts_cache.popitem(last=False)
+        return audio
+
+    def _say(self, text: str, cache: bool = False):
+        """Speak text on the TTS thread, blocking until playback ends"""
+        clean = SPEECH_MARKUP.sub("", text)
+
+        if cache and self._tts_cache is not None:
+            try:
+                audio = self._cached_audio(clean)
+            except (OSError, RuntimeError) as e:
+                print(f"⚠️ TTS cache error: {e}")
+            else:
+                winsound.PlaySound(audio, winsound.SND_MEMORY)
+                return
+
+        if self.piper is not None:
+            winsound.PlaySound(self._piper_wav(clean), winsound.SND_MEMORY)
+            return
+
+        if self.synthesizer is not None:
+            self._finish_speech(self._speak_sentence(clean))
+            return
+
         self.engine.say(clean)
         self.engine.runAndWait()
 
+    def _speech_item(self, text: str):
+        """Print a line and build its TTS queue item"""
+        print(f"\n🤖 JARVIS: {text}\n")
+        # Only the fixed lines replay from the phrase cache; dynamic text
+        # (times, search terms, LLM replies) would just churn it
+        return (self._say, text, text in CANNED_PHRASES)
+
+    def speak(self, text: str):
+        """Convert text to speech (queued; returns before playback ends)
+
+        Blocks while the TTS queue is full, so call it off the event loop;
+        coroutines use speak_async.
+        """
+        self._tts_q.put(self._speech_item(text))
+
+    async def speak_async(self, text: str):
+        """speak() for the event loop: waits for queue space without blocking the loop"""
+        await self._enqueue_speech(self._speech_item(text))
+
+    async def _enqueue_speech(self, item):
+        """Queue a TTS item, waiting on a worker thread when the queue is full"""
+        try:
+            self._tts_q.put_nowait(item)
+        except queue.Full:
+            await asyncio.to_thread(self._tts_q.put, item)
+
+    def close(self):
+        """Stop the TTS thread once queued speech has played"""
+        if self._tts_thread.is_alive():
+            self._tts_q.put(None)
+            self._tts_thread.join()
+
+    def is_speaking(self) -> bool:
+        """True while speech is queued or playing"""
+        return self._tts_q.unfinished_tasks > 0
+
+    def wait_until_spoken(self):
+        """Block until everything queued has been spoken"""
+        self._tts_q.join()
+
+    def interrupt_speech(self):
+        """Drop queued speech and cut off what is playing, where the backend allows"""
+        while True:
+            try:
+                self._tts_q.get_nowait()
+            except queue.Empty:
+                break
+            self._tts_q.task_done()
+
+        # pyttsx3 can only be stopped from its own thread, so its current
+        # sentence plays out; the rest of the reply is already gone
+        if self.synthesizer is not None:
+            self.synthesizer.stop_speaking_async()
+        elif WAV_PLAYBACK_AVAILABLE:
+            winsound.PlaySound(None, 0)  # None stops the current sound
+
+    async def _speak_stream(self, sentences: asyncio.Queue):
+        """Hand queued sentences to the TTS thread until a None sentinel arrives"""
+        while (sentence := await sentences.get()) is not None:
+            if self.synthesizer is not None:
+                # Azure plays its requests in order, so each sentence is sent
+                # as soon as it completes; the TTS thread only waits on it
+                item = (self._finish_speech, self._speak_sentence(sentence))
+            else:
+                # A stock acknowledgement replays from the phrase cache
+                item = (self._say, sentence, sentence in CANNED_PHRASES)
+            await self._enqueue_speech(item)
+
     # =====================================================
 
+    def _init_streaming_stt(self):
+        """Open the Cloud Speech client once; listen() falls back to batch without it"""
+        self.speech_client = None
+        project = os.environ.get("GOOGLE_CLOUD_PROJECT")
+        if not CLOUD_SPEECH_AVAILABLE or not project:
+            return
+
+        self.speech_client = SpeechClient()
+        config = cloud_speech.StreamingRecognitionConfig(
+            config=cloud_speech.RecognitionConfig(
+                explicit_decoding_config=cloud_speech.ExplicitDecodingConfig(
+                    encoding=cloud_speech.ExplicitDecodingConfig.AudioEncoding.LINEAR16,
+                    sample_rate_hertz=MIC_SAMPLE_RATE,
+                    audio_channel_count=1,
+                ),
+                language_codes=["en-US"],
+                model="short",
+            ),
+            streaming_features=cloud_speech.StreamingRecognitionFeatures(
+                interim_results=True
+            ),
+        )
+        self._stream_config_request = cloud_speech.StreamingRecognizeRequest(
+            recognizer=f"projects/{project}/locations/global/recognizers/_",
+            streaming_config=config,
+        )
+
+    def _listen_streaming(self):
+        """Stream microphone audio to Cloud Speech and return the first final transcript"""
+        stop = threading.Event()
+        reading = threading.Lock()
+
+        with self.microphone as source:
+            self._set_state(PipelineState.LISTENING)
+            print("🎤 Listening, Sir...")
+
+            if self.vad is not None:
+                self.vad.reset()
+
+            def requests():
+                yield self._stream_config_request
+                deadline = time.monotonic() + STREAM_LISTEN_SECONDS
+                while time.monotonic() < deadline:
+                    with reading:
+                        if stop.is_set() or self._stop_listening.is_set():
+                            return
+                        chunk = source.stream.read(source.CHUNK)
+                    yield cloud_speech.StreamingRecognizeRequest(audio=chunk)
+                    # Closing the stream at end of speech makes the
+                    # server finalize now instead of on its own endpointer
+                    if self.vad is not None and self.vad.push(chunk):
+                        return
+
+            responses = self.speech_client.streaming_recognize(requests=requests())
+            try:
+                partial, partial_since, prefetched = None, 0.0, False
+                for response in responses:
+                    for result in response.results:
+                        if not result.alternatives:
+                            continue
+                        text = result.alternatives[0].transcript.strip()
+                        if result.is_final:
+                            print(f"📝 You said: {text}")
+                            return text or None
+
+                        # Once a partial hypothesis holds steady, start the
+                        # LLM on it while the user finishes (one per utterance)
+                        now = time.monotonic()
+                        if text != partial:
+                            partial, partial_since = text, now
+                        elif text and not prefetched and now - partial_since >= PREFETCH_STABLE_SECONDS:
+                            prefetched = True
+                            self._request_prefetch(text)
+                return None
+
+            except GoogleAPICallError:
+                self.speak("Speech service is unavailable, Sir.")
+                return None
+
+            finally:
+                # gRPC pulls requests on its own thread; wait out any read
+                # in progress so the mic isn't closed underneath it
+                responses.cancel()
+                with reading:
+                    stop.set()
+
+    def _calibrate(self, duration: float, source=None):
+        """Measure the ambient noise floor and set the energy threshold from it"""
+        if source is None:
+            with self.microphone as source:
+                self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+        else:
+            self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+        self._calibrated_at = time.monotonic()
+
+    def _capture_utterance(self, source, timeout: float, phrase_time_limit: float):
+        """Record one utterance with Silero VAD endpointing; None if none starts"""
+        self.vad.reset()
+        preroll = deque(maxlen=VAD_PREROLL_FRAMES)
+        deadline = time.monotonic() + timeout
+        max_frames = int(phrase_time_limit * MIC_SAMPLE_RATE / VAD_FRAME)
+
+        while not self.vad.in_speech:
+            if self._stop_listening.is_set():
+                return None
+            if self.is_speaking():
+                deadline = time.monotonic() + timeout  # Starts when JARVIS stops
+            elif time.monotonic() > deadline:
+                return None
+            frame = source.stream.read(VAD_FRAME)
+            preroll.append(frame)
+            self.vad.push(frame)
+
+        if self.is_speaking():
+            self.interrupt_speech()  # The user barged in
+        frames = list(preroll)
+        while len(frames) < max_frames:
+            if self._stop_listening.is_set():
+                return None
+            frame = source.stream.read(VAD_FRAME)
+            frames.append(frame)
+            if self.vad.push(frame):
+                break
+        return b"".join(frames)
+
+    def _recognize(self, audio) -> str:
+        """Transcribe captured audio, on-device with Whisper when available"""
+        if self.whisper is None:
+            return self.recognizer.recognize_google(audio)
+
+        pcm = audio.get_raw_data(convert_rate=MIC_SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.whisper.transcribe(
+            samples, language="en", beam_size=1,
+            vad_filter=self.vad is None,  # Silero already trimmed the clip
+        )
+        text = "".join(segment.text for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
     def listen(self):
         """Listen for voice input"""
+        # Unless barge-in can catch the user talking over JARVIS, the mic
+        # opens once speech has ended so it doesn't transcribe JARVIS
+        barge_in = BARGE_IN and self.vad is not None and self.speech_client is None
+        if not barge_in:
+            self.wait_until_spoken()
+        if self._stop_listening.is_set():
+            return None
+
+        if self.speech_client is not None:
+            return self._listen_streaming()
+
         with self.microphone as source:
+            self._set_state(PipelineState.LISTENING)
             print("🎤 Listening, Sir...")
-            self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
 
             try:
-                audio = self.recognizer.listen(
-                    source, timeout=5, phrase_time_limit=15
-                )
+                if self.vad is not None:
+                    pcm = self._capture_utterance(
+                        source, timeout=5, phrase_time_limit=15
+                    )
+                    if pcm is None:
+                        raise sr.WaitTimeoutError("listening timed out")
+                    audio = sr.AudioData(pcm, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+                else:
+                    audio = self.recognizer.listen(
+                        source, timeout=5, phrase_time_limit=15
+                    )
+                self._set_state(PipelineState.TRANSCRIBING)
                 print("⚙️ Processing...")
-                text = self.recognizer.recognize_google(audio)
+                text = self._recognize(audio)
                 print(f"📝 You said: {text}")
                 return text
 
             except sr.WaitTimeoutError:
+                # Nobody spoke, so the room is quiet enough to re-measure
+                # without delaying a turn
+                if time.monotonic() - self._calibrated_at >= RECALIBRATE_SECONDS:
+                    self._calibrate(duration=0.5, source=source)
                 return None
             except sr.UnknownValueError:
                 self.speak("I did not catch that, Sir. Please repeat.")
@@ -88,121 +800,331 @@ class JarvisAssistant:
 
     # =====================================================
 
-    def call_openai(self, user_message: str) -> str:
-        """Call OpenAI for intelligent response"""
+    @staticmethod
+    def _openai_http_client():
+        """Pooled HTTP client for OpenAI; HTTP/2 when the h2 package is installed"""
+        try:
+            return DefaultAsyncHttpxClient(http2=True, limits=OPENAI_KEEPALIVE)
+        except ImportError:
+            return DefaultAsyncHttpxClient(limits=OPENAI_KEEPALIVE)
 
-        self.conversation_history.append(
-            {"role": "user", "content": user_message}
-        )
+    async def _keep_warm(self):
+        """Ping the API while idle so its pooled connection stays open"""
+        while True:
+            await asyncio.sleep(KEEP_WARM_SECONDS)
+            try:
+                await self.client.models.list()
+            except Exception as e:
+                print(f"⚠️ OpenAI keep-alive failed: {e}")
+
+    def _count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            return len(text) // 4 + 1
+        return len(self._encoding.encode(text))
 
-        messages = [
+    def _messages_for(self, user_message: str) -> list:
+        """Prompt for a reply to user_message, without touching the history"""
+        # Newest messages first, as many as fit the token budget
+        start = len(self.conversation_history)
+        budget = HISTORY_TOKEN_BUDGET
+        while start and self._history_tokens[start - 1] <= budget:
+            start -= 1
+            budget -= self._history_tokens[start]
+        return [
             {"role": "system", "content": self.system_prompt},
-            *self.conversation_history[-10:],  # keep memory small
+            *self.conversation_history[start:],
+            {"role": "user", "content": user_message},
         ]
 
+    def _remember(self, role: str, content: str):
+        """Append a message to the history, condensing old turns past the budget"""
+        self.conversation_history.append({"role": role, "content": content})
+        self._history_tokens.append(self._count_tokens(content))
+        if (
+            sum(self._history_tokens) > HISTORY_TOKEN_BUDGET
+            and len(self.conversation_history) > SUMMARY_MESSAGES
+            and (self._summary_task is None or self._summary_task.done())
+        ):
+            # Keep a reference: the loop only holds tasks weakly
+            self._summary_task = asyncio.create_task(self._summarize_history())
+            self._summary_task.add_done_callback(self._summary_done)
+
+    @staticmethod
+    def _summary_done(task: asyncio.Task):
+        """Report a summary task that died instead of losing its exception"""
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ History summary failed: {task.exception()}")
+
+    async def _summarize_history(self):
+        """Replace the oldest messages with a short summary of them"""
+        oldest = self.conversation_history[:SUMMARY_MESSAGES]
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in oldest)
         try:
-            print("🧠 Thinking...")
-            response = self.client.chat.completions.create(
-                model="gpt-4.1-mini",
+            response = await self.client.chat.completions.create(
+                model=SMART_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "Condense this conversation between a user and JARVIS "
+                            "into a brief note of the facts and requests worth "
+                            "remembering. Under 100 words."
+                        ),
+                    },
+                    {"role": "user", "content": transcript},
+                ],
+                temperature=0.2,
+                max_tokens=SUMMARY_MAX_TOKENS,
+            )
+            summary = response.choices[0].message.content.strip()
+        except Exception as e:
+            # The token window still bounds the prompt without a summary
+            print(f"⚠️ History summary failed: {e}")
+            return
+
+        # New turns were only appended meanwhile, so the oldest are in place
+        note = f"Earlier in this conversation: {summary}"
+        self.conversation_history[:SUMMARY_MESSAGES] = [
+            {"role": "system", "content": note}
+        ]
+        self._history_tokens[:SUMMARY_MESSAGES] = [self._count_tokens(note)]
+
+    def _route(self, user_message: str):
+        """Pick (client, model) for a turn: fast for short or casual ones"""
+        text = user_message.strip().lower()
+        if self._count_tokens(text) < FAST_MAX_TOKENS or CHIT_CHAT.search(text):
+            return self.llm_fast
+        return self.llm_smart
+
+    async def _generate(self, messages: list, deltas: asyncio.Queue):
+        """Stream completion text into deltas, ending with a None sentinel"""
+        client, model = self._route(messages[-1]["content"])
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
                 messages=messages,
                 temperature=0.4,
+                stream=True,
             )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    deltas.put_nowait(delta)
+        finally:
+            deltas.put_nowait(None)
+
+    def _start_prefetch(self, partial_text: str):
+        """Begin generating a reply to a partial transcript (on the event loop)"""
+        self._discard_prefetch()
+        deltas = asyncio.Queue()
+        task = asyncio.create_task(
+            self._generate(self._messages_for(partial_text), deltas)
+        )
+        self._prefetch = (partial_text.lower(), task, deltas)
 
-            answer = response.choices[0].message.content
+    def _request_prefetch(self, partial_text: str):
+        """Ask the event loop to prefetch a reply (called from the listen thread)"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._start_prefetch, partial_text)
 
-            self.conversation_history.append(
-                {"role": "assistant", "content": answer}
+    def _discard_prefetch(self):
+        """Cancel a prefetched reply that was not used"""
+        if self._prefetch is not None:
+            task = self._prefetch[1]
+            if task.done() and not task.cancelled():
+                task.exception()  # Mark a failed prefetch's error as seen
+            task.cancel()
+            self._prefetch = None
+
+    async def call_openai(self, user_message: str) -> str:
+        """Stream an OpenAI response, speaking each sentence as it completes"""
+
+        # Reuse the reply prefetched from the partial transcript when the
+        # final transcript turned out the same; otherwise start fresh
+        if self._prefetch is not None and self._prefetch[0] == user_message.strip().lower():
+            _, generator, deltas = self._prefetch
+            self._prefetch = None
+        else:
+            self._discard_prefetch()
+            deltas = asyncio.Queue()
+            generator = asyncio.create_task(
+                self._generate(self._messages_for(user_message), deltas)
             )
 
+        self._remember("user", user_message)
+
+        # LLM tokens feed the TTS thread sentence by sentence, so the
+        # first sentence plays while the rest is still being generated
+        sentences = asyncio.Queue()
+        speaker = asyncio.create_task(self._speak_stream(sentences))
+        self._replying = True
+
+        try:
+            print("🧠 Thinking...")
+            parts = []
+            pending = ""
+            while (delta := await deltas.get()) is not None:
+                if not parts:
+                    print("\n🤖 JARVIS: ", end="", flush=True)
+                print(delta, end="", flush=True)
+                parts.append(delta)
+                pending += delta
+
+                cut = 0
+                for match in SENTENCE_END.finditer(pending):
+                    cut = match.end()
+                if cut:
+                    if sentence := pending[:cut].strip():
+                        sentences.put_nowait(sentence)
+                    pending = pending[cut:]
+
+            # Surfaces any API error raised while streaming
+            await generator
+
+            print("\n")
+            if pending.strip():
+                sentences.put_nowait(pending.strip())
+
+            answer = "".join(parts)
+
+            self._remember("assistant", answer)
+
             return answer
 
         except Exception as e:
             print(f"❌ OpenAI error: {e}")
-            return "I am experiencing a systems issue, Sir."
+            answer = "I am experiencing a systems issue, Sir."
+            sentences.put_nowait(answer)
+            return answer
+
+        finally:
+            sentences.put_nowait(None)
+            await speaker
+            self._replying = False
 
     # =====================================================
 
-    def execute_command(self, command: str, ai_response: str):
+    async def _launch(self, program: str, flags: int = 0):
+        """Start a program without waiting for it to exit"""
+        try:
+            await asyncio.create_subprocess_exec(
+                program,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                creationflags=flags,
+            )
+        except OSError as e:
+            print(f"❌ Could not start {program}: {e}")
+
+    def _open_url(self, url: str):
+        """Open a URL on a worker thread; the browser hand-off can block"""
+        asyncio.get_running_loop().run_in_executor(None, webbrowser.open, url)
+
+    async def execute_command(self, command: str, ai_response: str):
         """Execute system or browser commands"""
 
         cmd = command.lower()
 
+        # Launched programs are detached so the next listen starts at once
+        # (the flags only exist on Windows, where these programs do)
         if "open notepad" in cmd:
-            os.system("notepad")
+            await self._launch(
+                "notepad.exe", getattr(subprocess, "DETACHED_PROCESS", 0)
+            )
 
         elif "open calculator" in cmd:
-            os.system("calc")
+            await self._launch(
+                "calc.exe", getattr(subprocess, "DETACHED_PROCESS", 0)
+            )
 
         elif "open command prompt" in cmd or "open cmd" in cmd:
-            os.system("start cmd")
+            await self._launch(
+                "cmd.exe", getattr(subprocess, "CREATE_NEW_CONSOLE", 0)
+            )
 
         elif "search for" in cmd or "google" in cmd:
             query = cmd.replace("search for", "").replace("google", "").strip()
             if query:
-                webbrowser.open(
+                self._open_url(
                     f"https://www.google.com/search?q={query}"
                 )
 
         elif "show images of" in cmd or "images of" in cmd:
             query = cmd.replace("images of", "").replace("show images of", "").strip()
             if query:
-                webbrowser.open(
+                self._open_url(
                     f"https://www.google.com/search?q={query}&tbm=isch"
                 )
 
         # Open first URL mentioned by AI
-        urls = re.findall(r"https?://\S+", ai_response)
-        if urls:
-            webbrowser.open(urls[0])
+        url = URL.search(ai_response)
+        if url:
+            self._open_url(url.group())
 
     # =====================================================
 
-    def process_command(self, command: str) -> bool:
+    async def process_command(self, command: str) -> bool:
         """Main decision logic"""
 
         if command is None:
             return True
 
+        self._set_state(PipelineState.THINKING)
         cmd = command.lower()
 
         if any(x in cmd for x in ["exit", "quit", "goodbye jarvis", "shut down"]):
-            self.speak("It has been a pleasure serving you, Sir.")
+            await self.speak_async("It has been a pleasure serving you, Sir.")
             return False
 
         if "time" in cmd:
             now = datetime.datetime.now().strftime("%I:%M %p")
-            self.speak(f"The time is {now}, Sir.")
+            await self.speak_async(f"The time is {now}, Sir.")
             return True
 
         if "date" in cmd:
             today = datetime.datetime.now().strftime("%A, %B %d, %Y")
-            self.speak(f"Today is {today}, Sir.")
+            await self.speak_async(f"Today is {today}, Sir.")
+            return True
+
+        # Built-in commands need no LLM round trip
+        if COMMAND_INTENT.match(cmd.strip()):
+            await self.speak_async("Right away, Sir.")
+            await self.execute_command(command, "")
             return True
 
-        # AI-powered response
-        ai_response = self.call_openai(command)
-        self.speak(ai_response)
-        self.execute_command(command, ai_response)
+        # AI-powered response (spoken while it streams)
+        ai_response = await self.call_openai(command)
+        await self.execute_command(command, ai_response)
         return True
 
     # =====================================================
 
-    def run(self):
+    async def run(self):
         """Main loop"""
-        while True:
-            try:
-                command = self.listen()
-                if command:
-                    if not self.process_command(command):
-                        break
-                time.sleep(0.3)
-
-            except KeyboardInterrupt:
-                self.speak("Shutting down. Until next time, Sir.")
-                break
-            except Exception as e:
-                print(f"❌ System error: {e}")
-                time.sleep(1)
+        self._loop = asyncio.get_running_loop()
+        keep_warm = asyncio.create_task(self._keep_warm())
+        try:
+            while True:
+                try:
+                    # The microphone blocks, so it runs off the event loop
+                    command = await asyncio.to_thread(self.listen)
+                    if command:
+                        if not await self.process_command(command):
+                            break
+                    # Local answers (time, date, exit) leave a prefetch unused
+                    self._discard_prefetch()
+
+                except Exception as e:
+                    print(f"❌ System error: {e}")
+                    await asyncio.sleep(1)
+        finally:
+            # On Ctrl+C the runner cancels this task but still joins the
+            # listen thread; stopping it here keeps shutdown prompt
+            self._stop_listening.set()
+            keep_warm.cancel()
+
+        await asyncio.to_thread(self.wait_until_spoken)
 
 
 # =========================================================
@@ -214,11 +1136,24 @@ def main():
     print("           J.A.R.V.I.S  –  Voice AI Assistant")
     print("=" * 70)
 
+    jarvis = None
     try:
         jarvis = JarvisAssistant()
-        jarvis.run()
+        if UVLOOP_AVAILABLE:
+            uvloop.run(jarvis.run())
+        else:
+            asyncio.run(jarvis.run())
+    except KeyboardInterrupt:
+        # The runner cancels the loop on Ctrl+C and re-raises here
+        if jarvis is not None:
+            jarvis.interrupt_speech()
+            jarvis.speak("Shutting down. Until next time, Sir.")
+            jarvis.wait_until_spoken()
     except Exception as e:
         print(f"❌ Critical error: {e}")
+    finally:
+        if jarvis is not None:
+            jarvis.close()
 
 
 if __name__ == "__main__":